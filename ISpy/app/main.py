@@ -4,6 +4,7 @@ import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 from tkinter.scrolledtext import ScrolledText
 import threading
+import time
 import webbrowser
 
 from app.services.ping import ping
@@ -16,8 +17,12 @@ from app.services.social_enhanced import enhanced_lookup
 from app.services.social_lookup import check_all, generate_variants
 from app.services.social_search import search_profiles, direct_probe_many
 
-from app.services.breach_check import scan, load_sources, list_all_files, get_enabled, set_enabled, import_folder as svc_import_folder
-from app.services.password_check import hibp_k_anon, local_password_hit
+from app.services.breach_check import scan_iter, scan_page, export_scan, is_pattern, scan_many, scan_fuzzy, load_sources, catalog, set_enabled
+from app.services.breach_import import import_files, import_folder as svc_import_folder, overlap_report
+from app.services.breach_compile import compile_all
+from app.services.breach_indexer import BackgroundIndexer
+from app.services.pwned_offline import available as pwned_offline_available
+from app.services.password_check import hibp_k_anon, local_password_hit, configure_range_cache, configure_salt_schemes, audit_password_file
 
 from app.services.sniff import list_connections, start_capture, stop_capture, list_interfaces, capture_running, adapter_stats
 from app.services.install_scanner import install_best
@@ -49,6 +54,18 @@ class App(tk.Tk):
         self._setup_styles()
         self._build()
         self._conn_auto_job = None
+        self._indexer = BackgroundIndexer(on_status=lambda s: self.after(0, self.index_status.set, s),
+                                          enabled=lambda: bool(cfg_load().get("breach_use_index", True)))
+        self._indexer.start()
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
+        cfg = cfg_load(); configure_range_cache(cfg.get("hibp_cache_ttl_hours"), cfg.get("hibp_cache_max_mb")); configure_salt_schemes(cfg.get("breach_salt_schemes"))
+
+    def _on_close(self) -> None:
+        # Let the indexer roll back / finish its SQLite write before exiting.
+        # Its status updates go through Tk, which is blocked while we join.
+        self._indexer.on_status = lambda s: None
+        self._indexer.stop(); self._indexer.join()
+        self.destroy()
 
     def _setup_styles(self) -> None:
         style = ttk.Style(self)
@@ -127,12 +144,37 @@ class App(tk.Tk):
         ttk.Label(br, text="Email / Username / Domain:").pack(side="left")
         self.breach_var = tk.StringVar()
         ttk.Entry(br, textvariable=self.breach_var, width=40).pack(side="left", padx=6)
-        ttk.Button(br, text="Scan", command=self.do_breach).pack(side="left", padx=4)
+        self._breach_btns = []  # disabled while a breach scan runs (one at a time)
+        for text, cmd in (("Scan", self.do_breach), ("Export", self.do_breach_export), ("Fuzzy", self.do_breach_fuzzy)):
+            b = ttk.Button(br, text=text, command=cmd); b.pack(side="left", padx=4); self._breach_btns.append(b)
+        self.fuzzy_dist = tk.IntVar(value=1)
+        ttk.Spinbox(br, from_=1, to=3, width=3, textvariable=self.fuzzy_dist).pack(side="left")
+        self.breach_subdomains = tk.BooleanVar(value=False)
+        ttk.Checkbutton(br, text="Subdomains", variable=self.breach_subdomains).pack(side="left", padx=4)
         ttk.Button(br, text="Sources", command=self.list_sources).pack(side="left", padx=4)
         ttk.Button(br, text="Manage Sources", command=self.manage_sources).pack(side="left", padx=4)
         ttk.Button(br, text="Import Pack", command=self.import_pack).pack(side="left", padx=4)
         ttk.Button(br, text="Import SecLists", command=self.import_seclists).pack(side="left", padx=4)
         ttk.Button(br, text="Import Folder", command=self.do_import_folder).pack(side="left", padx=4)
+        ttk.Button(br, text="Compile", command=self.do_compile_sources).pack(side="left", padx=4)
+
+        prog = ttk.Frame(tab_breach); prog.pack(fill="x", padx=4, pady=(0,6))
+        self.breach_first = tk.BooleanVar(value=False)
+        ttk.Checkbutton(prog, text="Stop at first hit", variable=self.breach_first).pack(side="left", padx=(0,6))
+        self.breach_pb = ttk.Progressbar(prog, mode="determinate", length=260, maximum=1); self.breach_pb.pack(side="left", padx=6)
+        self.breach_status = tk.StringVar(value="")
+        ttk.Label(prog, textvariable=self.breach_status).pack(side="left", padx=6)
+        self.breach_cancel_btn = ttk.Button(prog, text="Cancel", command=self.cancel_breach, state="disabled"); self.breach_cancel_btn.pack(side="left", padx=4)
+        self.breach_more_btn = ttk.Button(prog, text="More", command=self.breach_more, state="disabled"); self.breach_more_btn.pack(side="left", padx=4)
+        self.index_status = tk.StringVar(value="")
+        ttk.Label(prog, textvariable=self.index_status).pack(side="right", padx=6)
+        self._breach_cancel = None
+        self._breach_page = None  # (pattern, next offset, cursor) while a wildcard query has more pages
+
+        bulk = ttk.Frame(tab_breach); bulk.pack(fill="x", padx=4, pady=(0,6))
+        ttk.Label(bulk, text="Bulk targets (one per line):").pack(side="left", anchor="n")
+        self.breach_bulk = tk.Text(bulk, height=4, width=50, bg="#111111", fg=FG, insertbackground=FG, font=("Consolas",10)); self.breach_bulk.pack(side="left", padx=6)
+        b = ttk.Button(bulk, text="Scan List", command=self.do_breach_bulk); b.pack(side="left", padx=4, anchor="n"); self._breach_btns.append(b)
 
         pwd = ttk.Frame(tab_breach); pwd.pack(fill="x", padx=4, pady=6)
         ttk.Label(pwd, text="Password Check:").pack(side="left")
@@ -141,6 +183,7 @@ class App(tk.Tk):
         self.use_k_anon = tk.BooleanVar(value=True)
         ttk.Checkbutton(pwd, text="Online (HIBP k-anon)", variable=self.use_k_anon).pack(side="left", padx=6)
         ttk.Button(pwd, text="Check", command=self.do_pwd_check).pack(side="left", padx=4)
+        b = ttk.Button(pwd, text="Check Password File", command=self.do_pwd_audit); b.pack(side="left", padx=4); self._breach_btns.append(b)
 
         cfg = cfg_load()
         self.use_hibp_email = tk.BooleanVar(value=bool(cfg.get("use_hibp_email_scan", False)))
@@ -349,34 +392,85 @@ class App(tk.Tk):
         self.append(f"$ pwd-check {masked} ({'k-anon' if self.use_k_anon.get() else 'local'})")
         def work():
             if self.use_k_anon.get():
-                found,count=hibp_k_anon(pwd); return f"password: {'found' if found else 'not found'}" + (f" (seen {count} times) — via HIBP k-anon" if found else " — via HIBP k-anon")
-            found,src=local_password_hit(pwd); return f"password: {'found in ' + src if found else 'not found in local lists'}"
+                via="offline Pwned Passwords file" if pwned_offline_available("sha1") or pwned_offline_available("ntlm") else "HIBP k-anon"
+                found,count=hibp_k_anon(pwd); return f"password: {'found' if found else 'not found'}" + (f" (seen {count} times) — via {via}" if found else f" — via {via}")
+            found,src=local_password_hit(pwd, use_index=bool(cfg_load().get("breach_use_index", True))); return f"password: {'found in ' + src if found else 'not found in local lists'}"
         self.run_async(work, spinner="Checking…")
 
+    def do_pwd_audit(self):
+        if self._breach_cancel: return messagebox.showinfo("Password Audit", "A scan is already running.")
+        path=filedialog.askopenfilename(title="Password file (one per line)", filetypes=[("Text",".txt .lst"),("All files","*.*")])
+        if not path: return
+        out=filedialog.asksaveasfilename(title="Save audit results", defaultextension=".csv", filetypes=[("CSV",".csv"),("Gzipped CSV",".csv.gz")])
+        if not out: return
+        if not messagebox.askyesno("Password Audit","Check every password in the file with HIBP k-anonymity? Only 5-character SHA-1 prefixes are sent; results list line numbers and hashes, never the passwords."): return
+        self.append(f"$ pwd-audit {os.path.basename(path)} -> {out}")
+        cancel = self._scan_started("Hashing…")
+        def progress(done, total):
+            self.after(0, lambda: (self.breach_pb.configure(maximum=max(total,1), value=done), self.breach_status.set(f"{done:,} / {total:,} ranges")))
+        def post(res):
+            self._scan_finished()
+            if isinstance(res, str): self.breach_status.set("Audit failed"); return self.append(res)
+            self.breach_status.set("Cancelled" if res["cancelled"] else "Done")
+            self.append(f"Audited {res['passwords']:,} password(s) ({res['unique']:,} unique, {res['prefixes']:,} range request(s) at most): "
+                        f"{res['found']:,} found in breaches" + (f", {res['errors']:,} not checked (fetch errors)" if res["errors"] else "") +
+                        (" — cancelled early." if res["cancelled"] else ".") + f" Results: {out}")
+        self.run_async(lambda: audit_password_file(path, out, cancel=cancel, progress=progress), post=post)
+
     def do_breach(self):
         target=self.breach_var.get().strip()
         if not target: return messagebox.showwarning("Breach Check", "Enter an email, username, or domain.")
+        if self._breach_cancel: return messagebox.showinfo("Breach Check", "A scan is already running.")
+        if is_pattern(target): return self.do_breach_page(target, 0, None)
         self.append(f"$ breach-scan {target}")
-        def combo():
-            local = scan(target); cfg = cfg_load()
-            if self.use_hibp_email.get() and cfg.get("hibp_api_key") and "@" in target:
-                ok,data = breached_account(target, cfg.get("hibp_api_key")); return ("combo", local, (ok,data))
-            return ("local", local, None)
-        def post_combo(payload):
-            kind, local, hibp = payload
-            if isinstance(local, tuple): count,matches = local
-            else: self.append(str(local)); return
+        cfg = cfg_load(); cancel = self._scan_started("Scanning…")
+        opts = dict(use_index=bool(cfg.get("breach_use_index", True)), workers=int(cfg.get("breach_workers", 1)),
+                    subdomains=self.breach_subdomains.get() and "@" not in target and "." in target,
+                    stop_after_first=self.breach_first.get(), cancel=cancel)
+        use_hibp = self.use_hibp_email.get() and cfg.get("hibp_api_key") and "@" in target
+        live_max = 200  # identity-only lines streamed while scanning; full details go behind the reveal prompt
+        state = {"t": 0.0, "bytes": (0, 0), "hits": 0}  # written by the worker, shown at most every 0.2 s
+        def update(force=False):
+            now = time.monotonic()
+            if not force and now - state["t"] < 0.2: return
+            state["t"] = now; (done, total), n = state["bytes"], state["hits"]
+            def show():
+                self.breach_pb.configure(maximum=max(total,1), value=done)
+                self.breach_status.set((f"{done/(1<<20):.1f} / {total/(1<<20):.1f} MB" if total else "Scanning…")+f" – {n} hit(s)")
+            self.after(0, show)
+        def progress(done, total):
+            state["bytes"] = (done, total); update(done >= total)
+        def indexing(path):
+            name = os.path.basename(path); state["t"] = time.monotonic()
+            self.after(0, lambda: self.breach_status.set(f"Indexing {name}…"))
+        def on_hit(n, m):
+            if n <= live_max:
+                parts=[f"source={m.get('source','')}"]+[f"{k}={m.get(k)}" for k in ("email","username","domain") if m.get(k)]
+                self.append(" + "+", ".join(parts))
+            elif n == live_max+1: self.append(" + … (further hits not shown live)")
+        def work():
+            matches=[]
+            try:
+                for m in scan_iter(target, progress=progress, indexing=indexing, **opts):
+                    matches.append(m); n=state["hits"]=len(matches)
+                    if n <= live_max+1: self.after(0, lambda n=n, m=m: on_hit(n, m))
+                    else: update()
+            except Exception as e:
+                return ("error", matches, str(e))
+            hibp = breached_account(target, cfg.get("hibp_api_key")) if use_hibp and not cancel.is_set() else None
+            return ("ok", matches, hibp)
+        def finish(res):
+            self._scan_finished()
+            kind, matches, hibp = res if isinstance(res, tuple) else ("error", [], res)
+            count = len(matches)
+            self.breach_status.set(("Cancelled" if cancel.is_set() else "Done")+f" – {count} hit(s)")
+            if kind=="error": self.append(f"[error] {hibp}"); hibp=None
+            if cancel.is_set(): self.append(f"Scan cancelled after {count} match(es).")
             if count==0: self.append("No matches found in local breach lists.")
             else:
                 self.append(f"Found {count} matches across local lists.")
                 if messagebox.askyesno("Reveal details?","Matches found. Reveal full breached info?"):
-                    lines=[]; 
-                    for m in matches:
-                        parts=[f"source={m.get('source','')}"]
-                        for key in ("email","username","domain","password","password_hash","salt","src_label"):
-                            if m.get(key): parts.append(f"{key}={m.get(key)}")
-                        lines.append(" - "+", ".join(parts))
-                    self.append("\n".join(lines))
+                    self.append("\n".join(self._fmt_breach_hits(matches)))
                 else: self.append("(Local details were hidden by user choice.)")
             if hibp:
                 ok,data=hibp
@@ -384,33 +478,176 @@ class App(tk.Tk):
                     if data: self.append("HIBP: account appears in "+str(len(data))+" breach(es): "+", ".join(data[:10])+(" …" if len(data)>10 else ""))
                     else: self.append("HIBP: no breached sites for this account.")
                 else: self.append("HIBP error: "+str(data))
-        self.run_async(combo, post=post_combo, spinner="Scanning…")
+        self.run_async(work, post=finish)
+
+    BREACH_PAGE = 100  # hits per page for wildcard queries
+
+    def do_breach_page(self, pattern, offset, cursor):
+        if self._breach_cancel: return messagebox.showinfo("Breach Check", "A scan is already running.")
+        self.append(f"$ breach-scan {pattern} (hits {offset+1}-{offset+self.BREACH_PAGE})")
+        self._breach_page = None; self.breach_more_btn.configure(state="disabled")
+        cfg = cfg_load(); cancel = self._scan_started("Searching…")
+        opts = dict(use_index=bool(cfg.get("breach_use_index", True)), cancel=cancel, progress=self._mb_progress())
+        def post(res):
+            self._scan_finished()
+            if not isinstance(res, tuple): self.breach_status.set("Search failed"); return self.append(str(res))
+            hits, more = res  # more: cursor for the next page, or None
+            if cancel.is_set(): self.append(f"Search cancelled after {len(hits)} match(es).")
+            if not hits: self.breach_status.set("Cancelled" if cancel.is_set() else "Done"); return self.append("No matches found in local breach lists." if offset==0 else "No further matches.")
+            self.append(f"Showing matches {offset+1}-{offset+len(hits)}"+(" (press More for the next page)." if more else "."))
+            if messagebox.askyesno("Reveal details?","Matches found. Reveal full breached info?"):
+                self.append("\n".join(self._fmt_breach_hits(hits)))
+            else: self.append("(Local details were hidden by user choice.)")
+            if more:
+                self._breach_page = (pattern, offset+len(hits), more); self.breach_more_btn.configure(state="normal")
+            self.breach_status.set(f"{offset+len(hits)} hit(s) shown"+(" – more available" if more else ""))
+        self.run_async(lambda: scan_page(pattern, cursor, self.BREACH_PAGE, **opts), post=post)
+
+    def breach_more(self):
+        if self._breach_page: self.do_breach_page(*self._breach_page)
+
+    def do_breach_export(self):
+        target=self.breach_var.get().strip()
+        if not target: return messagebox.showwarning("Export", "Enter an email, username, domain or pattern.")
+        if self._breach_cancel: return messagebox.showinfo("Export", "A scan is already running.")
+        path=filedialog.asksaveasfilename(title="Export breach hits", defaultextension=".csv",
+                                          filetypes=[("CSV",".csv"),("JSON Lines",".jsonl"),("Gzipped CSV",".csv.gz"),("Gzipped JSON Lines",".jsonl.gz")])
+        if not path: return
+        self.append(f"$ breach-export {target} -> {path}")
+        cfg = cfg_load(); cancel = self._scan_started("Exporting…")
+        opts = dict(use_index=bool(cfg.get("breach_use_index", True)), workers=int(cfg.get("breach_workers", 1)),
+                    subdomains=self.breach_subdomains.get() and "@" not in target and "." in target, cancel=cancel)
+        progress = self._mb_progress()
+        def post(res):
+            self._scan_finished()
+            if isinstance(res, str): self.breach_status.set("Export failed"); return self.append(res)
+            self.breach_status.set(("Cancelled" if cancel.is_set() else "Done")+f" – {res} hit(s) exported")
+            self.append(f"Exported {res} hit(s) to {path}"+(" (cancelled early)." if cancel.is_set() else "."))
+        self.run_async(lambda: export_scan(target, path, progress=progress, **opts), post=post)
+
+    def cancel_breach(self):
+        if self._breach_cancel: self._breach_cancel.set(); self.breach_status.set("Cancelling…")
+
+    def _scan_started(self, status):
+        """Marks a breach scan as running (one at a time); returns its cancel event."""
+        cancel = threading.Event(); self._breach_cancel = cancel
+        self.breach_pb.configure(value=0, maximum=1); self.breach_status.set(status); self.breach_cancel_btn.configure(state="normal")
+        for b in self._breach_btns: b.configure(state="disabled")
+        return cancel
+
+    def _scan_finished(self):
+        self._breach_cancel = None; self.breach_cancel_btn.configure(state="disabled")
+        for b in self._breach_btns: b.configure(state="normal")
+
+    def _mb_progress(self):
+        """progress(done, total) for a worker thread: bytes read, shown at most every 0.2 s."""
+        last = [0.0]
+        def progress(done, total):
+            now = time.monotonic()
+            if now - last[0] < 0.2 and done < total: return
+            last[0] = now
+            self.after(0, lambda: (self.breach_pb.configure(maximum=max(total,1), value=done), self.breach_status.set(f"{done/(1<<20):.1f} / {total/(1<<20):.1f} MB")))
+        return progress
+
+    def do_breach_fuzzy(self):
+        target=self.breach_var.get().strip()
+        if not target: return messagebox.showwarning("Breach Check", "Enter an email or username.")
+        try: k=max(1,min(3,int(self.fuzzy_dist.get())))
+        except (tk.TclError, ValueError): k=1
+        if self._breach_cancel: return messagebox.showinfo("Breach Check", "A scan is already running.")
+        self.append(f"$ breach-fuzzy {target} (distance <= {k})")
+        use_index=bool(cfg_load().get("breach_use_index", True)); cancel=self._scan_started("Searching…"); progress=self._mb_progress()
+        def post(res):
+            self._scan_finished()
+            if not isinstance(res, tuple): self.breach_status.set("Search failed"); return self.append(str(res))
+            count,matches=res
+            self.breach_status.set(("Cancelled" if cancel.is_set() else "Done")+f" – {count} hit(s)")
+            if cancel.is_set(): self.append(f"Search cancelled after {count} near match(es).")
+            if count==0: return self.append("No near matches found in local breach lists.")
+            self.append(f"Found {count} near matches (closest first).")
+            if messagebox.askyesno("Reveal details?","Matches found. Reveal full breached info?"):
+                self.append("\n".join(self._fmt_breach_hits(matches)))
+            else: self.append("(Local details were hidden by user choice.)")
+        self.run_async(lambda: scan_fuzzy(target, k, use_index=use_index, cancel=cancel, progress=progress), post=post)
+
+    def _fmt_breach_hits(self, matches) -> list:
+        lines=[]
+        for m in matches:
+            parts=[f"source={m.get('source','')}"]
+            for key in ("email","username","domain","password","password_hash","salt","src_label"):
+                if m.get(key): parts.append(f"{key}={m.get(key)}")
+            lines.append(" - "+", ".join(parts))
+        return lines
+
+    def do_breach_bulk(self):
+        targets=[line.strip() for line in self.breach_bulk.get("1.0","end").splitlines() if line.strip()]
+        if not targets: return messagebox.showwarning("Breach Check", "Paste one email, username, or domain per line.")
+        if self._breach_cancel: return messagebox.showinfo("Breach Check", "A scan is already running.")
+        self.append(f"$ breach-scan-list ({len(targets)} target(s))")
+        cfg=cfg_load(); use_index=bool(cfg.get("breach_use_index", True)); workers=int(cfg.get("breach_workers", 1))
+        cancel=self._scan_started("Scanning…"); progress=self._mb_progress()
+        def post(res):
+            self._scan_finished()
+            if isinstance(res, str): self.breach_status.set("Scan failed"); return self.append(res)
+            total=sum(len(v) for v in res.values())
+            self.breach_status.set(("Cancelled" if cancel.is_set() else "Done")+f" – {total} hit(s)")
+            if cancel.is_set(): self.append(f"Scan cancelled after {total} match(es).")
+            for t,hits in res.items(): self.append(f" - {t}: {len(hits)} match(es)")
+            if total==0: return self.append("No matches found in local breach lists.")
+            self.append(f"Found {total} matches for {sum(1 for v in res.values() if v)} of {len(res)} target(s).")
+            if messagebox.askyesno("Reveal details?","Matches found. Reveal full breached info?"):
+                for t,hits in res.items():
+                    if hits: self.append(f"{t}:"); self.append("\n".join(self._fmt_breach_hits(hits)))
+            else: self.append("(Local details were hidden by user choice.)")
+        self.run_async(lambda: scan_many(targets, use_index=use_index, workers=workers, cancel=cancel, progress=progress), post=post)
 
     def list_sources(self):
-        files=load_sources()
-        if not files: self.append("No breach files detected in app/breaches.")
+        srcs=[x for x in catalog() if x.enabled]
+        if not srcs: self.append("No breach files detected in app/breaches.")
         else:
             self.append("Loaded breach files:")
-            for p in files: self.append(f" - {os.path.basename(p)}")
+            for x in srcs: self.append(f" - {self._fmt_source(x)}")
+            over=overlap_report()
+            if over:
+                self.append("Overlapping packs (estimated; consider disabling one of each pair):")
+                for a,b,r in over[:20]: self.append(f" - {a} ~ {b}: {r:.0%}")
+
+    def _fmt_source(self, x) -> str:
+        size = f"{x.size/(1<<20):.1f} MB" if x.size >= 1<<20 else f"{x.size/1024:.1f} KB"
+        return f"{x.name}  [{x.format}, {size}" + (f", {x.rows:,} rows]" if x.rows is not None else "]")
 
     def manage_sources(self):
-        files=list_all_files(); enabled=set(get_enabled())
-        if not files: return messagebox.showinfo("Manage Sources","No breach files found in app/breaches.")
-        top=tk.Toplevel(self); top.title("Manage Sources"); top.configure(bg=BLACK)
-        ttk.Label(top, text="Enable/disable breach files:").pack(anchor="w", padx=10, pady=8)
-        vars_map={}; frame=ttk.Frame(top); frame.pack(fill="both", expand=True, padx=10, pady=8)
-        for f in files:
-            var=tk.BooleanVar(value=(f in enabled) or (len(enabled)==0)); ttk.Checkbutton(frame, text=f, variable=var).pack(anchor="w"); vars_map[f]=var
+        srcs=catalog()
+        if not srcs: return messagebox.showinfo("Manage Sources","No breach files found in app/breaches.")
+        top=tk.Toplevel(self); top.title("Manage Sources"); top.configure(bg=BLACK); top.geometry("640x420")
+        ttk.Label(top, text=f"Select the breach files to enable ({len(srcs)} found, Ctrl/Shift-click for several):").pack(anchor="w", padx=10, pady=8)
+        frame=ttk.Frame(top); frame.pack(fill="both", expand=True, padx=10, pady=4)
+        lb=tk.Listbox(frame, selectmode="extended", bg="#111111", fg=FG, selectbackground="#1f5f1f", font=("Consolas",10), activestyle="none")
+        sb=ttk.Scrollbar(frame, orient="vertical", command=lb.yview); lb.configure(yscrollcommand=sb.set)
+        sb.pack(side="right", fill="y"); lb.pack(side="left", fill="both", expand=True)
+        # One insert call: per-row widgets made this dialog crawl with thousands of packs.
+        lb.insert("end", *[self._fmt_source(x) for x in srcs])
+        for i,x in enumerate(srcs):
+            if x.enabled: lb.selection_set(i)
         def save_and_close():
-            selected=[name for name,v in vars_map.items() if v.get()]; set_enabled(selected); messagebox.showinfo("Sources", f"Saved. Enabled files: {len(selected)}"); top.destroy()
-        btns=ttk.Frame(top); btns.pack(fill="x", padx=10, pady=10); ttk.Button(btns, text="Save", command=save_and_close).pack(side="right")
+            selected=[srcs[i].name for i in lb.curselection()]; set_enabled(selected); self._indexer.poke(); messagebox.showinfo("Sources", f"Saved. Enabled files: {len(selected)}"); top.destroy()
+        btns=ttk.Frame(top); btns.pack(fill="x", padx=10, pady=10)
+        save=ttk.Button(btns, text="Save", command=save_and_close)
+        # An empty enabled list means "all enabled" (see _load_enabled), so saving no selection isn't offered.
+        def sync(*_): save.configure(state="normal" if lb.curselection() else "disabled")
+        ttk.Button(btns, text="All", command=lambda: (lb.selection_set(0,"end"), sync())).pack(side="left")
+        ttk.Button(btns, text="None", command=lambda: (lb.selection_clear(0,"end"), sync())).pack(side="left", padx=6)
+        save.pack(side="right"); lb.bind("<<ListboxSelect>>", sync); sync()
 
     def import_pack(self):
-        path=filedialog.askopenfilename(title="Import breach pack", filetypes=[("Data packs",".zip .gz .txt .csv .json"),("All files","*.*")])
+        path=filedialog.askopenfilename(title="Import breach pack", filetypes=[("Data packs",".zip .gz .txt .csv .json .jsonl .ndjson"),("All files","*.*")])
         if not path: return
-        try:
-            base=os.path.basename(path); dest=os.path.join(os.path.dirname(__file__),"breaches",base); import shutil; shutil.copy2(path,dest); self.append(f"Imported: {base}")
-        except Exception as e: messagebox.showerror("Import", f"Failed to import: {e}")
+        def post(res):
+            if isinstance(res, str): return messagebox.showerror("Import", f"Failed to import: {res}")
+            for name,status in res: self.append(f"Imported: {name}" if status=="ok" else f"Import {name}: {status}")
+            self._indexer.poke()
+        # Hashing and sketching a big pack takes a while: keep it off the Tk thread.
+        self.run_async(lambda: import_files([path]), post=post, spinner="Importing…")
 
     def import_seclists(self):
         from app.services.seclists_import import get_presets, download_files
@@ -426,9 +663,19 @@ class App(tk.Tk):
             urls=[url for var,url in vars_map if var.get()]; extra=[line.strip() for line in text.get("1.0","end").splitlines() if line.strip()]; urls.extend(extra)
             if not urls: return messagebox.showwarning("Import SecLists","Select at least one preset or enter URLs.")
             top.destroy(); self.append(f"$ seclists-import ({len(urls)} file(s))")
-            self.run_async(lambda: download_files(urls), post=lambda res: ( [self.append(f" - {name}: {status}") for (name,status) in res], self.append("Done. Use Sources / Manage Sources to confirm and enable.") ), spinner="Downloading…")
+            self.run_async(lambda: download_files(urls), post=lambda res: ( [self.append(f" - {name}: {status}") for (name,status) in res], self.append("Done. Use Sources / Manage Sources to confirm and enable."), self._indexer.poke() ), spinner="Downloading…")
         ttk.Button(btns, text="Download", command=do_download).pack(side="right"); ttk.Button(btns, text="Cancel", command=top.destroy).pack(side="right", padx=6)
 
+    def do_compile_sources(self):
+        paths=load_sources()
+        if not paths: return messagebox.showinfo("Compile","No breach files found in app/breaches.")
+        if not messagebox.askyesno("Compile","Compile the enabled breach files into sorted .ispyidx lookups? Large files can take a while."): return
+        self.append(f"$ breach-compile ({len(paths)} file(s))")
+        def post(res):
+            if isinstance(res, str): return self.append(res)
+            for name,status in res: self.append(f" - {name}: {status}")
+        self.run_async(lambda: compile_all(paths), post=post, spinner="Compiling…")
+
     def do_import_folder(self):
         folder=filedialog.askdirectory(title="Choose a folder to import recursively")
         if not folder: return
@@ -437,6 +684,7 @@ class App(tk.Tk):
         def post(res):
             for name,status in res: self.append(f" - {name}: {status}")
             self.append("Done. Use Sources / Manage Sources to enable/disable.")
+            self._indexer.poke()
         self.run_async(work, post=post, spinner="Importing…")
 
     # ---------- Traffic ----------
@@ -502,6 +750,12 @@ class App(tk.Tk):
         ttk.Label(win, text="Have I Been Pwned (HIBP) API Key:").pack(anchor="w", padx=10, pady=(10,2))
         hibp_var=tk.StringVar(value=cfg.get("hibp_api_key","")); ttk.Entry(win, textvariable=hibp_var, width=60, show="*").pack(fill="x", padx=10)
         hibp_en=tk.BooleanVar(value=bool(cfg.get("use_hibp_email_scan", False))); ttk.Checkbutton(win, text="Use HIBP for breach scans (email only)", variable=hibp_en).pack(anchor="w", padx=10, pady=4)
+        idx_en=tk.BooleanVar(value=bool(cfg.get("breach_use_index", True))); ttk.Checkbutton(win, text="Use persistent breach index (app/breaches/_index.sqlite)", variable=idx_en).pack(anchor="w", padx=10, pady=4)
+        wrow=ttk.Frame(win); wrow.pack(fill="x", padx=10, pady=2)
+        ttk.Label(wrow, text="Breach scan workers (0 = all cores):").pack(side="left"); workers_var=tk.IntVar(value=int(cfg.get("breach_workers",1))); ttk.Entry(wrow, textvariable=workers_var, width=8).pack(side="left", padx=8)
+        crow=ttk.Frame(win); crow.pack(fill="x", padx=10, pady=2)
+        ttk.Label(crow, text="Password range cache – keep (hours):").pack(side="left"); ttl_var=tk.DoubleVar(value=float(cfg.get("hibp_cache_ttl_hours",168))); ttk.Entry(crow, textvariable=ttl_var, width=8).pack(side="left", padx=8)
+        ttk.Label(crow, text="Max size (MB):").pack(side="left", padx=(12,0)); cmax_var=tk.DoubleVar(value=float(cfg.get("hibp_cache_max_mb",64))); ttk.Entry(crow, textvariable=cmax_var, width=8).pack(side="left", padx=8)
         ttk.Label(win, text="Capture rotation:").pack(anchor="w", padx=10, pady=(10,2))
         row=ttk.Frame(win); row.pack(fill="x", padx=10, pady=2)
         ttk.Label(row, text="Duration (sec):").pack(side="left"); dur_var=tk.IntVar(value=int(cfg.get("capture_rotate",{}).get("duration_sec",60))); ttk.Entry(row, textvariable=dur_var, width=8).pack(side="left", padx=8)
@@ -509,8 +763,10 @@ class App(tk.Tk):
         ttk.Label(row, text="Files (count):").pack(side="left", padx=(12,0)); files_var=tk.IntVar(value=int(cfg.get("capture_rotate",{}).get("files",5))); ttk.Entry(row, textvariable=files_var, width=8).pack(side="left", padx=8)
         btns=ttk.Frame(win); btns.pack(fill="x", padx=10, pady=10)
         def save_close():
-            new_cfg=cfg_load(); new_cfg["hibp_api_key"]=hibp_var.get().strip(); new_cfg["use_hibp_email_scan"]=bool(hibp_en.get())
+            new_cfg=cfg_load(); new_cfg["hibp_api_key"]=hibp_var.get().strip(); new_cfg["use_hibp_email_scan"]=bool(hibp_en.get()); new_cfg["breach_use_index"]=bool(idx_en.get()); new_cfg["breach_workers"]=int(max(0,workers_var.get()))
             new_cfg["capture_rotate"]={"duration_sec": int(max(5,dur_var.get())), "filesize_mb": int(max(1,fsize_var.get())), "files": int(max(1,files_var.get()))}
+            new_cfg["hibp_cache_ttl_hours"]=float(max(0,ttl_var.get())); new_cfg["hibp_cache_max_mb"]=float(max(1,cmax_var.get()))
+            configure_range_cache(new_cfg["hibp_cache_ttl_hours"], new_cfg["hibp_cache_max_mb"])
             cfg_save(new_cfg); self.append("Settings saved."); win.destroy()
         ttk.Button(btns, text="Save", command=save_close).pack(side="right"); ttk.Button(btns, text="Cancel", command=win.destroy).pack(side="right", padx=6)
 
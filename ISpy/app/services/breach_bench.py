@@ -0,0 +1,363 @@
+
+"""
+Breach-scan benchmark: builds a reproducible synthetic corpus in every
+supported format and times scan strategies over it.
+
+    python -m app.services.breach_bench --rows 1000000 --out bench.json
+    python -m app.services.breach_bench --rows 1000000 --compare bench.json
+"""
+import argparse
+import contextlib
+import gzip
+import io
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+
+from . import breach_check, password_check, password_index
+from .breach_bloom import build as bloom_build
+from .breach_compile import compile_all
+from .breach_index import ensure_index
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+FORMATS = ("txt", "csv", "json", "jsonl", "gz", "zip", "nested_zip")
+DOMAINS = 1000
+MISS = "nobody@nowhere.invalid"
+_EXIT_GRACE = 30  # seconds a strategy's process gets to exit after sending its result
+
+
+def _row(i: int, rng: random.Random) -> tuple[str, str, str]:
+    user = f"user{i}"
+    return f"{user}@d{i % DOMAINS}.example", user, "".join(rng.choices("abcdefghijklmnopqrstuvwxyz0123456789", k=10))
+
+
+def _rows(start: int, stop: int, seed: int):
+    # Seeded per file so any slice of the corpus is reproducible on its own.
+    rng = random.Random(seed * 1_000_003 + start)
+    for i in range(start, stop):
+        yield _row(i, rng)
+
+
+def _write_txt(f, rows):
+    # Text lists are one value per line (see breach_check._iter_txt_stream).
+    for email, _user, _pwd in rows:
+        f.write(email + "\n")
+
+
+def _write_csv(f, rows):
+    f.write("email,username,password\n")
+    for email, user, pwd in rows:
+        f.write(f"{email},{user},{pwd}\n")
+
+
+def _write_json(f, rows):
+    f.write("[")
+    sep = "\n"
+    for email, user, pwd in rows:
+        f.write(sep + json.dumps({"email": email, "username": user, "password": pwd}))
+        sep = ",\n"
+    f.write("\n]\n")
+
+
+def _write_jsonl(f, rows):
+    for email, user, pwd in rows:
+        f.write(json.dumps({"email": email, "username": user, "password": pwd}) + "\n")
+
+
+def _write_file(fmt: str, path_base: str, rows) -> str:
+    if fmt in ("txt", "csv", "json", "jsonl"):
+        path = f"{path_base}.{fmt}"
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            {"txt": _write_txt, "csv": _write_csv, "json": _write_json, "jsonl": _write_jsonl}[fmt](f, rows)
+        return path
+    if fmt == "gz":
+        path = path_base + ".txt.gz"
+        with gzip.open(path, "wt", encoding="utf-8", compresslevel=6) as f:
+            _write_txt(f, rows)
+        return path
+    name = os.path.basename(path_base)
+    if fmt == "zip":
+        path = path_base + ".zip"
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as z, z.open(name + ".csv", "w", force_zip64=True) as m:
+            with _text(m) as f:
+                _write_csv(f, rows)
+        return path
+    # nested_zip: outer.zip -> inner.zip -> lists.csv.gz
+    path = path_base + ".zip"
+    inner = path_base + ".inner.zip"
+    try:
+        with zipfile.ZipFile(inner, "w", zipfile.ZIP_STORED) as z, z.open(name + ".csv.gz", "w", force_zip64=True) as m:
+            with gzip.GzipFile(fileobj=m, mode="wb", compresslevel=6) as g, _text(g) as f:
+                _write_csv(f, rows)
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_STORED) as z:
+            z.write(inner, name + "_inner.zip")
+    finally:
+        os.remove(inner)
+    return path
+
+
+@contextlib.contextmanager
+def _text(fbin):
+    f = io.TextIOWrapper(fbin, encoding="utf-8", newline="")
+    try:
+        yield f
+    finally:
+        f.flush()
+        f.detach()
+
+
+def generate_corpus(root: str, rows: int, formats=FORMATS, files: int = 4, seed: int = 1) -> dict[str, list[str]]:
+    """
+    Writes `rows` synthetic rows per format, split over `files` files, into
+    root/<format>/. Same arguments -> byte-identical corpus.
+    Returns {format: [paths]}.
+    """
+    out = {}
+    bounds = [rows * k // files for k in range(files + 1)]
+    for fmt in formats:
+        d = os.path.join(root, fmt)
+        os.makedirs(d, exist_ok=True)
+        out[fmt] = [_write_file(fmt, os.path.join(d, f"synthetic_{k:02d}"), _rows(bounds[k], bounds[k + 1], seed))
+                    for k in range(files)]
+    return out
+
+
+@contextlib.contextmanager
+def _breach_dir(d: str):
+    # Services resolve the breach folder through these module globals.
+    saved = breach_check.BREACH_DIR, breach_check.ENABLED_FILE, password_check.BREACH_DIR
+    breach_check.BREACH_DIR = d
+    breach_check.ENABLED_FILE = os.path.join(d, "_enabled.json")
+    password_check.BREACH_DIR = d
+    try:
+        yield
+    finally:
+        breach_check.BREACH_DIR, breach_check.ENABLED_FILE, password_check.BREACH_DIR = saved
+
+
+def _max_rss_kb():
+    """Peak RSS of this process or its largest finished worker (parallel scans)."""
+    if resource is None:
+        return None
+    rss = max(resource.getrusage(who).ru_maxrss for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN))
+    return rss // 1024 if sys.platform == "darwin" else rss  # macOS reports bytes
+
+
+def _measure(fn, trace: bool) -> dict:
+    """Runs fn(mark_first_hit) and returns timings (+ traced peak when asked)."""
+    first = []
+    def mark():
+        if not first:
+            first.append(time.perf_counter())
+    if trace:
+        tracemalloc.start()
+    t0 = time.perf_counter()
+    try:
+        hits = fn(mark)
+        t1 = time.perf_counter()
+        peak = tracemalloc.get_traced_memory()[1] if trace else None
+    finally:
+        if trace:
+            tracemalloc.stop()
+    return {"seconds": t1 - t0, "ttfh_s": (first[0] - t0) if first else None, "hits": hits,
+            "peak_traced_bytes": peak}
+
+
+def _child(conn, paths, hit, fmt, workers, name, trace):
+    try:
+        with _breach_dir(os.path.dirname(paths[0])):
+            fn = next(f for n, f, _full in _strategies(paths, hit, fmt, workers) if n == name)
+            m = _measure(fn, trace)
+        conn.send((m, _max_rss_kb()))
+    except BaseException as e:
+        conn.send(e)
+    finally:
+        conn.close()
+
+
+def _measure_isolated(paths, hit, fmt, workers, name, trace) -> dict:
+    """
+    _measure() for one strategy in a fresh (spawned, not forked) process, so
+    max_rss_kb is that strategy's own peak rather than the whole run's.
+    Without the resource module (Windows) it runs in-process and has no RSS.
+    """
+    if resource is None:
+        fn = next(f for n, f, _full in _strategies(paths, hit, fmt, workers) if n == name)
+        return {**_measure(fn, trace), "max_rss_kb": None}
+    ctx = multiprocessing.get_context("spawn")
+    recv, send = ctx.Pipe(duplex=False)
+    p = ctx.Process(target=_child, args=(send, paths, hit, fmt, workers, name, trace))
+    p.start()
+    send.close()
+    try:
+        res = recv.recv()
+    except EOFError:
+        res = None
+    p.join(_EXIT_GRACE)
+    if p.is_alive():  # result is in; don't let a stuck exit hang the run
+        p.kill()
+        p.join()
+    if res is None:
+        raise RuntimeError(f"{fmt} {name}: benchmark process exited with code {p.exitcode}")
+    if isinstance(res, BaseException):
+        raise res
+    m, rss = res
+    return {**m, "max_rss_kb": rss}
+
+
+def _iter_scan(target, **kw):
+    def run(mark):
+        n = 0
+        for _hit in breach_check.scan_iter(target, **kw):
+            mark()
+            n += 1
+        return n
+    return run
+
+
+def _strategies(paths: list[str], hit: str, fmt: str, workers: int):
+    """
+    (name, fn, full_pass) in run order; later ones rely on earlier (on-disk)
+    side effects, so each can run in its own process.
+    Full passes use a domain present in every file so Bloom filters can't
+    skip any of them; the single-email target shows time-to-first-hit.
+    """
+    every = "d7.example"
+    def bloom(_mark):
+        for p in paths:
+            bloom_build(p)
+        return 0
+    def index(_mark):
+        return len(ensure_index(paths))
+    def compile_(_mark):
+        return sum(1 for _n, status in compile_all(paths) if status == "ok")
+    def pwd_index(_mark):
+        return sum(1 for p in paths if password_index.build(p, password_check._iter_lines(p)))
+    def pwd(mark):
+        # Exact line match, same as for a password list.
+        found, _src = password_check.local_password_hit(hit)
+        if found:
+            mark()
+        return int(found)
+    out = [
+        ("bloom_build", bloom, True),
+        ("stream", _iter_scan(every, use_index=False), True),
+        ("stream_email", _iter_scan(hit, use_index=False), False),
+        ("stream_miss", _iter_scan(MISS, use_index=False), False),
+        ("parallel", _iter_scan(every, use_index=False, workers=workers), True),
+        ("index_build", index, True),
+        ("index_query", _iter_scan(hit, use_index=True), False),
+    ]
+    if fmt in ("txt", "gz"):  # what local_password_hit reads
+        out.append(("password_index", pwd_index, True))
+        out.append(("password_hit", pwd, False))
+    out += [
+        ("compile", compile_, True),
+        ("compiled_query", _iter_scan(hit, use_index=False), False),
+    ]
+    return out
+
+
+def run(rows: int = 1_000_000, formats=FORMATS, files: int = 4, seed: int = 1, workers: int = 0,
+        root: str | None = None, keep: bool = False, trace_memory: bool = False, log=None) -> dict:
+    """Generates the corpus, runs every strategy per format and returns the JSON-able report."""
+    log = log or (lambda line: print(line, file=sys.stderr))
+    own_root = root is None
+    root = root or tempfile.mkdtemp(prefix="ispy_bench_")
+    report = {
+        "rows": rows, "files": files, "seed": seed, "workers": workers,
+        "python": platform.python_version(), "platform": platform.platform(),
+        "cpu_count": os.cpu_count(), "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": [],
+    }
+    # The target sits in the middle of the corpus, so time-to-first-hit shows
+    # how much a strategy has to read before it finds something.
+    mid = rows // 2
+    bounds = [rows * k // files for k in range(files + 1)]
+    k = max(i for i in range(files) if bounds[i] <= mid)
+    for hit, _u, _pwd in _rows(bounds[k], mid + 1, seed):
+        pass
+    try:
+        t = time.perf_counter()
+        corpus = generate_corpus(root, rows, formats, files, seed)
+        log(f"corpus: {rows:,} rows x {len(formats)} formats in {time.perf_counter() - t:.1f}s ({root})")
+        for fmt, paths in corpus.items():
+            size = sum(os.path.getsize(p) for p in paths)
+            with _breach_dir(os.path.dirname(paths[0])):
+                for name, _fn, full in _strategies(paths, hit, fmt, workers):
+                    m = _measure_isolated(paths, hit, fmt, workers, name, trace_memory)
+                    sec = m["seconds"] or 1e-9
+                    res = {"format": fmt, "strategy": name, "rows": rows, "bytes": size,
+                           "rows_per_s": rows / sec if full else None,
+                           "mb_per_s": size / sec / (1 << 20) if full else None, **m}
+                    report["results"].append(res)
+                    log(f"{fmt:>10} {name:>14}: {sec:9.3f}s"
+                        + (f"  {res['rows_per_s']:>12,.0f} rows/s  {res['mb_per_s']:8.1f} MB/s" if full else "")
+                        + (f"  first hit {m['ttfh_s']:.3f}s" if m["ttfh_s"] is not None else ""))
+    finally:
+        if own_root and not keep:
+            shutil.rmtree(root, ignore_errors=True)
+    return report
+
+
+def compare(old: dict, new: dict, tolerance: float = 0.10, min_seconds: float = 0.05) -> list[str]:
+    """
+    Lines for every (format, strategy) that got slower than `tolerance` allows.
+    Timings under `min_seconds` in both reports are noise and are skipped.
+    """
+    before = {(r["format"], r["strategy"]): r["seconds"] for r in old.get("results", [])}
+    out = []
+    for r in new.get("results", []):
+        prev = before.get((r["format"], r["strategy"]))
+        if prev and max(prev, r["seconds"]) >= min_seconds and r["seconds"] > prev * (1 + tolerance):
+            out.append(f"{r['format']} {r['strategy']}: {prev:.3f}s -> {r['seconds']:.3f}s (+{(r['seconds'] / prev - 1) * 100:.0f}%)")
+    return out
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--formats", default=",".join(FORMATS), help="comma-separated subset of " + ",".join(FORMATS))
+    ap.add_argument("--files", type=int, default=4, help="files per format (parallel scans need > 1)")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--workers", type=int, default=0, help="processes for the parallel strategy (0 = all cores)")
+    ap.add_argument("--dir", help="build the corpus here (kept) instead of a temp dir")
+    ap.add_argument("--keep", action="store_true", help="keep the temp corpus")
+    ap.add_argument("--trace-memory", action="store_true", help="record tracemalloc peaks (slows every strategy)")
+    ap.add_argument("--out", help="write the JSON report here")
+    ap.add_argument("--compare", help="previous JSON report; exit 1 on >10%% slowdowns")
+    a = ap.parse_args(argv)
+    formats = tuple(f for f in a.formats.split(",") if f)
+    bad = [f for f in formats if f not in FORMATS]
+    if bad:
+        ap.error("unknown format(s): " + ", ".join(bad))
+    report = run(a.rows, formats, max(1, a.files), a.seed, a.workers, a.dir, a.keep, a.trace_memory)
+    if a.out:
+        with open(a.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1)
+    else:
+        json.dump(report, sys.stdout, indent=1)
+        print()
+    if a.compare:
+        with open(a.compare, "r", encoding="utf-8") as f:
+            slower = compare(json.load(f), report)
+        for line in slower:
+            print("SLOWER", line, file=sys.stderr)
+        return 1 if slower else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
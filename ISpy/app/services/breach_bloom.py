@@ -0,0 +1,125 @@
+
+import hashlib
+import mmap
+import os
+import struct
+
+from .breach_check import _iter_path
+
+# Sidecar layout: header, then the raw bit array.
+#   magic(8) | source size(Q) | source mtime_ns(q) | m bits(Q) | k hashes(I)
+MAGIC = b"ISPYBLM1"
+_HEADER = struct.Struct("<8sQqQI")
+SUFFIX = ".bloom"
+BITS_PER_KEY = 10   # ~1% false positives with K = 7
+K = 7
+
+
+def sidecar_path(path: str) -> str:
+    return path + SUFFIX
+
+
+def _positions(key: str, m: int, k: int):
+    d = hashlib.blake2b(key.encode("utf-8", "ignore"), digest_size=16).digest()
+    h1, h2 = struct.unpack("<QQ", d)
+    h2 |= 1
+    for i in range(k):
+        yield (h1 + i * h2) % m
+
+
+def row_keys(row: tuple):
+    """Filter keys for one parsed row: normalized e:/u:/d: keys."""
+    email, username, domain = row[0], row[1], row[2]
+    if email:
+        e = email.lower()
+        yield "e:" + e
+        if "@" in e:
+            yield "d:" + e.rpartition("@")[2]
+    if username:
+        yield "u:" + username.lower()
+    if domain:
+        yield "d:" + domain.lower()
+
+
+def _rows(path: str, cancel):
+    for n, row in enumerate(_iter_path(path), 1):
+        if cancel is not None and n % 4096 == 0 and cancel.is_set():
+            raise _Cancelled
+        yield row
+
+
+class _Cancelled(Exception):
+    pass
+
+
+def build(path: str, cancel=None) -> str | None:
+    """
+    Builds (or rebuilds) the sidecar filter for a source file; returns its
+    path. Two passes: the first counts the keys so the filter is sized for
+    them, the second sets the bits. Setting `cancel` (threading.Event-like)
+    abandons the build. Slow (pure Python), so only call it off the scan path.
+    """
+    try:
+        st = os.stat(path)
+        n = sum(1 for row in _rows(path, cancel) for _key in row_keys(row))
+        m = (max(1024, n) * BITS_PER_KEY + 7) // 8 * 8
+        bits = bytearray(m // 8)
+        for row in _rows(path, cancel):
+            for key in row_keys(row):
+                for p in _positions(key, m, K):
+                    bits[p >> 3] |= 1 << (p & 7)
+    except (OSError, _Cancelled):
+        return None
+    out = sidecar_path(path)
+    tmp = out + ".tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, st.st_size, st.st_mtime_ns, m, K))
+            f.write(bits)
+        os.replace(tmp, out)
+    except OSError:
+        return None
+    return out
+
+
+def is_current(path: str) -> bool:
+    """Whether `path` has a filter matching its current size/mtime."""
+    try:
+        return _is_current(sidecar_path(path), os.stat(path))
+    except OSError:
+        return False
+
+
+def _is_current(side: str, st: os.stat_result) -> bool:
+    try:
+        with open(side, "rb") as f:
+            magic, size, mtime_ns, _m, _k = _HEADER.unpack(f.read(_HEADER.size))
+    except (OSError, struct.error):
+        return False
+    return magic == MAGIC and size == st.st_size and mtime_ns == st.st_mtime_ns
+
+
+def might_contain(path: str, keys: list[str], build_missing: bool = True) -> bool:
+    """
+    False only when the file's filter proves none of `keys` can be in it.
+    Stale or missing filters are rebuilt first (size/mtime fingerprint) when
+    build_missing; scans pass False and leave building to the background
+    indexer. Any problem reading them answers True so the file still gets scanned.
+    """
+    if not keys:
+        return True
+    try:
+        st = os.stat(path)
+        side = sidecar_path(path)
+        if not _is_current(side, st):
+            if not build_missing or not build(path):
+                return True
+        with open(side, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            _magic, _size, _mtime, m, k = _HEADER.unpack(mm[:_HEADER.size])
+            base = _HEADER.size
+            for key in keys:
+                if all(mm[base + (p >> 3)] & (1 << (p & 7)) for p in _positions(key, m, k)):
+                    return True
+        return False
+    except Exception:
+        return True
@@ -1,11 +1,70 @@
-import os, json, csv, re, zipfile, gzip, io
+import os, json, csv, re, zipfile, gzip, io, mmap, functools, operator, threading, contextlib, zlib
+from concurrent.futures import ProcessPoolExecutor, wait as futures_wait
 from typing import Iterable
 
 BREACH_DIR = os.path.join(os.path.dirname(__file__), "..", "breaches")
 ENABLED_FILE = os.path.join(BREACH_DIR, "_enabled.json")
+# Files named "_*" in BREACH_DIR (state, index) are never breach sources.
+SOURCE_EXTS = (".txt",".csv",".json",".jsonl",".ndjson",".lst",".log",".zip",".gz")
+# "<source>.ispyidx" is the compiled (sorted, binary-searchable) form of a source.
+COMPILED_EXT = ".ispyidx"
 
-class BreachHit(dict):
-    pass
+# Parsers yield rows as plain tuples in this field order (None = absent), so
+# the scan loop can test the raw key before anything else is allocated.
+ROW_FIELDS = ("email","username","domain","password","password_hash","salt","source")
+
+class BreachHit:
+    """
+    One matched record, only built once a row has matched.
+    Reads like the dict it used to be (hit.get("email"), hit["source"]).
+    """
+    __slots__ = ("source","email","username","domain","password","password_hash","salt","src_label")
+
+    def __init__(self, source: str, email=None, username=None, domain=None,
+                 password=None, password_hash=None, salt=None, src_label=None):
+        self.source = source
+        self.email = email
+        self.username = username
+        self.domain = domain
+        self.password = password
+        self.password_hash = password_hash
+        self.salt = salt
+        self.src_label = src_label
+
+    def get(self, key: str, default=None):
+        v = getattr(self, key, None) if key in self.__slots__ else None
+        return default if v is None else v
+
+    def __getitem__(self, key: str):
+        v = self.get(key)
+        if v is None:
+            raise KeyError(key)
+        return v
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def items(self):
+        return [(k, getattr(self, k)) for k in self.__slots__ if getattr(self, k) is not None]
+
+    def keys(self):
+        return [k for k, _v in self.items()]
+
+    def to_dict(self) -> dict:
+        return dict(self.items())
+
+    def __eq__(self, other):
+        if isinstance(other, BreachHit):
+            return self.items() == other.items()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    def __repr__(self):
+        return f"BreachHit({self.to_dict()!r})"
+
+    def __reduce__(self):
+        return (BreachHit, tuple(getattr(self, k) for k in self.__slots__))
 
 def _load_enabled() -> set[str]:
     try:
@@ -24,155 +83,343 @@ def _save_enabled(enabled_list: list[str]):
     except Exception:
         pass
 
+class SourceInfo:
+    """One catalogue entry: a breach file in BREACH_DIR and what is known about it."""
+    __slots__ = ("name","path","size","mtime","format","rows","enabled")
+
+    def __init__(self, name: str, path: str, size: int, mtime: float, format: str, rows: int | None, enabled: bool):
+        self.name = name
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+        self.format = format
+        self.rows = rows
+        self.enabled = enabled
+
+    def __repr__(self):
+        return f"SourceInfo({self.name!r}, size={self.size}, format={self.format!r}, rows={self.rows}, enabled={self.enabled})"
+
+# (BREACH_DIR, dir mtime_ns, _enabled.json mtime_ns) -> entries; rebuilt
+# whenever a file is added/removed/renamed or the enabled set changes.
+_catalog_cache: tuple[tuple, list[SourceInfo]] | None = None
+
+def _mtime_ns(path: str) -> int | None:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+def _source_format(name: str) -> str:
+    lower = name.lower()
+    if lower.endswith(COMPILED_EXT):
+        return "compiled"
+    if lower.endswith(".gz"):
+        inner = os.path.splitext(lower[:-3])[1].lstrip(".")
+        return (inner if inner and "." + inner in SOURCE_EXTS else "txt") + ".gz"
+    return os.path.splitext(lower)[1].lstrip(".")
+
+def _known_rows(directory: str) -> dict[str, tuple[int, int, int]]:
+    """{name: (size, mtime_ns, rows)} from an existing index; never builds one."""
+    from .breach_index import row_counts
+    try:
+        return row_counts(directory)
+    except Exception:
+        return {}
+
+def catalog(refresh: bool = False) -> list[SourceInfo]:
+    """
+    The breach sources in BREACH_DIR (listing order) with size, mtime, format,
+    row count (when the index or a compiled file already knows it) and
+    enabled flag. Cached until the directory or _enabled.json changes.
+    """
+    global _catalog_cache
+    key = (BREACH_DIR, _mtime_ns(BREACH_DIR), _mtime_ns(ENABLED_FILE))
+    cached = _catalog_cache
+    if not refresh and cached and cached[0] == key:
+        return cached[1]
+    entries = []
+    if key[1] is not None:
+        listing = sorted(os.listdir(BREACH_DIR))
+        names = [n for n in listing if not n.startswith("_") and n.lower().endswith(SOURCE_EXTS)]
+        # Compiled files whose source was removed stand in for it.
+        present = set(names)
+        names += [n for n in listing if n.endswith(COMPILED_EXT) and not n.startswith("_") and n[:-len(COMPILED_EXT)] not in present]
+        en = _load_enabled()
+        counts = _known_rows(BREACH_DIR)
+        for name in names:
+            path = os.path.join(BREACH_DIR, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            rows = None
+            c = counts.get(name)
+            if c and c[:2] == (st.st_size, st.st_mtime_ns):
+                rows = c[2]
+            elif name.endswith(COMPILED_EXT):
+                from .breach_compile import record_count
+                rows = record_count(path)
+            # none explicitly enabled => everything is effectively enabled
+            entries.append(SourceInfo(name, path, st.st_size, st.st_mtime, _source_format(name), rows, not en or name in en))
+    _catalog_cache = (key, entries)
+    return entries
+
 def list_all_files() -> list[str]:
-    if not os.path.isdir(BREACH_DIR):
-        return []
-    names = [n for n in sorted(os.listdir(BREACH_DIR)) if any(n.lower().endswith(ext) for ext in (".txt",".csv",".json",".lst",".log",".zip",".gz"))]
-    return names
+    return [s.name for s in catalog()]
 
 def set_enabled(files: list[str]):
-    files_set = [f for f in files if f in list_all_files()]
-    _save_enabled(files_set)
+    known = set(list_all_files())
+    _save_enabled([f for f in files if f in known])
+    global _catalog_cache
+    _catalog_cache = None  # mtime granularity may hide a quick rewrite
 
 def get_enabled() -> list[str]:
-    en = _load_enabled()
-    if not en:
-        # none explicitly enabled => everything is effectively enabled
-        return list_all_files()
-    return [f for f in list_all_files() if f in en]
+    return [s.name for s in catalog() if s.enabled]
 
-def _iter_txt_stream(f) -> Iterable[dict]:
+def _value_row(s: str) -> tuple:
+    if "@" in s and "." in s:
+        return (s, None, None, None, None, None, None)
+    if "." in s and "/" not in s and " " not in s and "@" not in s:
+        return (None, None, s, None, None, None, None)
+    return (None, s, None, None, None, None, None)
+
+def _iter_txt_stream(f) -> Iterable[tuple]:
     for line in f:
         s = line.strip()
         if not s or s.startswith("#"):
             continue
-        row = {}
-        if "@" in s and "." in s:
-            row["email"] = s
-        elif "." in s and "/" not in s and " " not in s and "@" not in s:
-            row["domain"] = s
+        yield _value_row(s)
+
+def _csv_rows(reader, header: list[str]) -> Iterable[tuple]:
+    # Resolve the known columns once; per row only those cells are touched.
+    # Same precedence as the csv.DictReader parser this replaced: of identical
+    # header names the last column wins (even when empty); names equal only
+    # after lower/strip are taken in order of first appearance and the last
+    # non-empty one wins. Short rows read as empty cells, extra cells are
+    # ignored, as DictReader's restval/restkey left them.
+    first: dict[str, int] = {}
+    last: dict[str, int] = {}
+    for i, k in enumerate(header):
+        first.setdefault(k, i)
+        last[k] = i
+    pairs = [(last[k], ROW_FIELDS.index(k.lower().strip())) for k in sorted(first, key=first.get)
+             if k.lower().strip() in ROW_FIELDS]
+    if not pairs:
+        for _ in reader:  # nothing to yield, but a malformed file still raises csv.Error
+            pass
+        return
+    cols = [i for i, _ in pairs]
+    fields = [fi for _, fi in pairs]
+    width = max(cols) + 1
+    get = operator.itemgetter(*cols)
+    single = len(cols) == 1
+    blank = [None] * len(ROW_FIELDS)
+    for row in reader:
+        if len(row) >= width:
+            vals = (get(row),) if single else get(row)
         else:
-            row["username"] = s
-        yield row
+            vals = [row[c] if c < len(row) else "" for c in cols]
+        out = None
+        for fi, v in zip(fields, vals):
+            v = v.strip()
+            if v:
+                if out is None:
+                    out = blank[:]
+                out[fi] = v
+        if out is not None:
+            yield tuple(out)
 
-def _iter_txt(path: str) -> Iterable[dict]:
-    with open(path, "r", encoding="utf-8", errors="ignore") as f:
-        yield from _iter_txt_stream(f)
+def _combo_row(s: str) -> tuple:
+    # email:password / user:password, or a bare value
+    a, sep, b = s.partition(":")
+    if sep:
+        a, b = a.strip() or None, b.strip() or None
+        if a and "@" in a:
+            return (a, None, None, b, None, None, None)
+        return (None, a, None, b, None, None, None)
+    if "@" in s: return (s, None, None, None, None, None, None)
+    if "." in s: return (None, None, s, None, None, None, None)
+    return (None, s, None, None, None, None, None)
 
-def _iter_csv_stream(f) -> Iterable[dict]:
+def _iter_csv_stream(f) -> Iterable[tuple]:
     try:
-        reader = csv.DictReader(f)
-        for row in reader:
-            out = {}
-            for k,v in (row or {}).items():
-                if k is None: continue
-                kk = k.lower().strip()
-                vv = (v or "").strip()
-                if not vv: continue
-                if kk in ("email","username","domain","password","password_hash","salt","source"):
-                    out[kk] = vv
-            if out:
-                yield out
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is not None:
+            yield from _csv_rows(reader, header)
     except csv.Error:
         f.seek(0)
         for line in f:
             s = line.strip()
-            if not s or s.startswith("#"):
-                continue
-            if ":" in s:
-                a,b = s.split(":",1)
-                a,b = a.strip(), b.strip()
-                row = {}
-                if "@" in a: row["email"] = a
-                else: row["username"] = a
-                if b: row["password"] = b
-                yield row
-            else:
-                row = {}
-                if "@" in s: row["email"] = s
-                elif "." in s: row["domain"] = s
-                else: row["username"] = s
-                yield row
+            if s and not s.startswith("#"):
+                yield _combo_row(s)
 
-def _iter_csv(path: str) -> Iterable[dict]:
-    with open(path, "r", encoding="utf-8", errors="ignore", newline="") as f:
-        yield from _iter_csv_stream(f)
+_JSON_CHUNK = 64 * 1024
+_JSON_MAX_VALUE = 16 << 20  # characters; one breach record is never anywhere near this
+_JSON_SKIP = re.compile(r"[\s,\ufeff]*")
+_JSON_NUM_TAIL = re.compile(r"[0-9.eE+-]*")  # what a number cut by a chunk edge may continue with
 
-def _iter_json_stream(f) -> Iterable[dict]:
-    try:
-        obj = json.load(f)
-    except Exception:
-        return
-    if isinstance(obj, list):
-        for item in obj:
-            if isinstance(item, str):
-                s = item.strip()
-                if not s: continue
-                row = {}
-                if "@" in s and "." in s:
-                    row["email"] = s
-                elif "." in s and "/" not in s and " " not in s and "@" not in s:
-                    row["domain"] = s
-                else:
-                    row["username"] = s
-                yield row
-            elif isinstance(item, dict):
-                out = {}
-                for k,v in item.items():
-                    kk = str(k).lower().strip()
-                    vv = str(v).strip() if v is not None else ""
-                    if not vv: continue
-                    if kk in ("email","username","domain","password","password_hash","salt","source"):
-                        out[kk] = vv
-                if out:
-                    yield out
-
-def _iter_json(path: str) -> Iterable[dict]:
-    with open(path, "r", encoding="utf-8", errors="ignore") as f:
-        yield from _iter_json_stream(f)
-
-def _iter_zip(path: str) -> Iterable[dict]:
-    with zipfile.ZipFile(path, "r") as z:
-        for name in z.namelist():
-            lower = name.lower()
-            try:
-                with z.open(name) as fbin:
-                    data = fbin.read()
-                    if lower.endswith(('.txt','.lst','.log')):
-                        yield from _iter_txt_stream(io.StringIO(data.decode('utf-8','ignore')))
-                    elif lower.endswith('.csv'):
-                        yield from _iter_csv_stream(io.StringIO(data.decode('utf-8','ignore')))
-                    elif lower.endswith('.json'):
-                        yield from _iter_json_stream(io.StringIO(data.decode('utf-8','ignore')))
-            except Exception:
+def _json_row(item) -> tuple | None:
+    if isinstance(item, str):
+        s = item.strip()
+        return _value_row(s) if s else None
+    if isinstance(item, dict):
+        out = {}
+        for k,v in item.items():
+            kk = str(k).lower().strip()
+            vv = str(v).strip() if v is not None else ""
+            if not vv: continue
+            if kk in ROW_FIELDS:
+                out[kk] = vv
+        return tuple(out.get(k) for k in ROW_FIELDS) if out else None
+    return None
+
+def _iter_json_values(f) -> Iterable:
+    """
+    Incrementally decodes a text stream holding either one top-level array
+    (yields its elements) or JSON Lines / concatenated values (yields each
+    value). Only the element being decoded is buffered, so memory does not
+    depend on file size. Stops quietly at the first malformed value; a value
+    longer than _JSON_MAX_VALUE raises ValueError instead of being buffered.
+    """
+    scan_once = json.JSONDecoder().scan_once
+    skip = _JSON_SKIP.match
+    buf, pos, eof = "", 0, False
+    need = 0  # > 0: current value is incomplete, read at least this much more
+    array = None
+    while True:
+        if not eof and (need or len(buf) - pos <= _JSON_CHUNK // 16):
+            chunk = f.read(max(_JSON_CHUNK, need))
+            buf, pos, eof, need = buf[pos:] + chunk, 0, not chunk, 0
+        pos = skip(buf, pos).end()
+        if pos >= len(buf):
+            if eof: return
+            continue
+        if array is None:
+            array = buf[pos] == "["
+            if array:
+                pos += 1
                 continue
+        if array and buf[pos] == "]":
+            return
+        try:
+            obj, end = scan_once(buf, pos)
+        except (StopIteration, json.JSONDecodeError):
+            if eof: return
+            need = _json_need(buf, pos)  # grow geometrically so big values stay linear
+            continue
+        if isinstance(obj, (int, float)) and not isinstance(obj, bool):
+            # "1.5e10" cut after "1." scans as 1: only a delimiter (or EOF) ends a number.
+            tail = _JSON_NUM_TAIL.match(buf, end).end()
+            if tail == len(buf) and not eof:
+                need = _json_need(buf, pos)
+                continue
+            if tail > end:
+                return  # malformed number
+        elif end == len(buf) and not eof:
+            need = _json_need(buf, pos)  # a bare literal may continue in the next chunk
+            continue
+        pos = end
+        yield obj
+
+def _json_need(buf: str, pos: int) -> int:
+    need = len(buf) - pos
+    if need >= _JSON_MAX_VALUE:
+        raise ValueError(f"JSON value longer than {_JSON_MAX_VALUE} characters")
+    return need
+
+def _iter_json_stream(f) -> Iterable[tuple]:
+    for item in _iter_json_values(f):
+        row = _json_row(item)
+        if row:
+            yield row
+
+# Nested archives are read straight from their parent stream; cap the depth
+# so a crafted "zip of zips" cannot recurse forever.
+_MAX_NESTING = 4
+
+def _inner_name(name: str) -> str:
+    inner = name[:-3]
+    if inner.lower().endswith(SOURCE_EXTS):
+        return inner
+    return inner + ".txt"  # bare .gz files have always been read as text lists
 
-def _iter_gz(path: str) -> Iterable[dict]:
-    with gzip.open(path, "rt", encoding="utf-8", errors="ignore") as f:
-        yield from _iter_txt_stream(f)
-
-def _iter_path(path: str) -> Iterable[dict]:
-    p = path.lower()
-    if p.endswith(('.txt','.lst','.log')):
-        yield from _iter_txt(path)
-    elif p.endswith('.csv'):
-        yield from _iter_csv(path)
-    elif p.endswith('.json'):
-        yield from _iter_json(path)
-    elif p.endswith('.zip'):
-        yield from _iter_zip(path)
-    elif p.endswith('.gz'):
-        yield from _iter_gz(path)
+def _iter_member(name: str, fbin, depth: int = 0) -> Iterable[tuple]:
+    """
+    Parses a binary stream according to its file name. Text is decoded
+    incrementally through io.TextIOWrapper and nested .zip/.gz members are
+    opened from the parent stream, so memory stays flat whatever the member
+    size and nothing is extracted to disk.
+    """
+    lower = name.lower()
+    if lower.endswith('.zip'):
+        if depth >= _MAX_NESTING:
+            return
+        with zipfile.ZipFile(fbin, "r") as z:
+            for info in z.infolist():
+                if info.is_dir():
+                    continue
+                try:
+                    with z.open(info) as member:
+                        yield from _iter_member(info.filename, member, depth + 1)
+                except Exception:
+                    continue
+    elif lower.endswith('.gz'):
+        if depth >= _MAX_NESTING:
+            return
+        with gzip.GzipFile(fileobj=fbin, mode="rb") as g:
+            yield from _iter_member(_inner_name(name), g, depth + 1)
+    elif lower.endswith(('.txt','.lst','.log')):
+        yield from _iter_txt_stream(io.TextIOWrapper(fbin, encoding="utf-8", errors="ignore"))
+    elif lower.endswith('.csv'):
+        yield from _iter_csv_stream(io.TextIOWrapper(fbin, encoding="utf-8", errors="ignore", newline=""))
+    elif lower.endswith(('.json','.jsonl','.ndjson')):
+        yield from _iter_json_stream(io.TextIOWrapper(fbin, encoding="utf-8", errors="ignore"))
+
+class _CountingReader(io.RawIOBase):
+    """Raw file that counts the bytes pulled through it (for progress)."""
+
+    def __init__(self, path: str):
+        self._f = io.FileIO(path, "r")
+        self.count = 0
+
+    def readable(self): return True
+    def seekable(self): return True
+    def seek(self, pos, whence=io.SEEK_SET): return self._f.seek(pos, whence)
+    def tell(self): return self._f.tell()
+
+    def readinto(self, b):
+        n = self._f.readinto(b)
+        self.count += n or 0
+        return n
+
+    def close(self):
+        self._f.close()
+        super().close()
+
+def _iter_path(path: str, counter: _CountingReader | None = None) -> Iterable[tuple]:
+    """Yields ROW_FIELDS tuples for any supported source file."""
+    if path.endswith(COMPILED_EXT):
+        from .breach_compile import iter_records
+        yield from iter_records(path)
+        return
+    with io.BufferedReader(counter or io.FileIO(path, "r")) as f:
+        yield from _iter_member(path, f)
 
 def load_sources() -> list[str]:
-    files = []
-    enabled = set(get_enabled())  # returns all if none explicitly enabled
-    all_files = list_all_files()
-    # If enabled is a subset, use it; else use all files
-    use = enabled if set(enabled) <= set(all_files) else all_files
-    for name in use:
-        files.append(os.path.join(BREACH_DIR, name))
-    return files
+    # Listing order, so merged (parallel) results come back in a stable source order.
+    return [_prefer_compiled(s.path) for s in catalog() if s.enabled]
+
+def _prefer_compiled(path: str) -> str:
+    """The source's .ispyidx when it exists and is newer than the source."""
+    if path.endswith(COMPILED_EXT):
+        return path
+    try:
+        if os.path.getmtime(path + COMPILED_EXT) >= os.path.getmtime(path):
+            return path + COMPILED_EXT
+    except OSError:
+        pass
+    return path
 
 def _norm(s: str) -> str:
     return s.strip().lower()
@@ -183,65 +430,789 @@ def _looks_email(s: str) -> bool:
 def _looks_domain(s: str) -> bool:
     return "." in s and "/" not in s and " " not in s and "@" not in s
 
-def scan(target: str):
-    if not target:
-        return 0, []
-    t = _norm(target)
-    is_email = _looks_email(t)
-    is_domain = _looks_domain(t) and not is_email
+def _classify(t: str) -> str:
+    if _looks_email(t):
+        return "email"
+    if _looks_domain(t):
+        return "domain"
+    return "username"
+
+# Wildcard queries: "*" is any run of characters, "?" exactly one
+# (john*@gmail.com, *@corp.com, admin*). Each pattern is answered from the
+# longest literal it pins down: the prefix before the first wildcard, or the
+# email/domain suffix after the last one, as a range over sorted keys.
+WILDCARDS = "*?"
+
+def is_pattern(t: str) -> bool:
+    return any(c in t for c in WILDCARDS)
+
+def _pattern_kind(p: str) -> str:
+    if "@" in p:
+        return "email"
+    if "." in p and " " not in p and "/" not in p:
+        return "domain"
+    return "username"
+
+@functools.lru_cache(maxsize=256)
+def _pattern_rx(p: str):
+    return re.compile("".join(".*" if c == "*" else "." if c == "?" else re.escape(c) for c in p), re.S)
+
+@functools.lru_cache(maxsize=256)
+def pattern_plan(p: str) -> tuple[str, str, str | None, str | None]:
+    """
+    (kind, prefix, exact_domain, domain_suffix) for a normalized pattern.
+    exact_domain: email patterns whose domain part has no wildcard.
+    domain_suffix: the whole labels after the last wildcard ("*.corp.com" -> "corp.com").
+    """
+    kind = _pattern_kind(p)
+    prefix = p[:min(p.find(c) for c in WILDCARDS if c in p)]
+    dom = p.rpartition("@")[2] if kind == "email" else p if kind == "domain" else ""
+    exact = suffix = None
+    if dom and not is_pattern(dom):
+        exact = dom
+    elif dom:
+        tail = dom[max(dom.rfind(c) for c in WILDCARDS) + 1:]
+        if tail.startswith(".") and len(tail) > 1:
+            suffix = tail[1:]
+    return kind, prefix, exact, suffix
+
+def _pattern_match(p: str, row: tuple) -> bool:
+    rx = _pattern_rx(p)
+    kind = _pattern_kind(p)
+    email, username, domain = row[0], row[1], row[2]
+    if kind == "email":
+        return bool(email) and rx.fullmatch(email.lower()) is not None
+    if kind == "username":
+        return bool(username) and rx.fullmatch(username.lower()) is not None
+    edomain = email.lower().rpartition("@")[2] if email and "@" in email else ""
+    return bool(domain and rx.fullmatch(domain.lower())) or bool(edomain and rx.fullmatch(edomain))
+
+def _make_hit(src_name: str, row: tuple, kind: str) -> BreachHit:
+    email, username, domain, password, password_hash, salt, label = row
+    if kind == "email":
+        username = domain = None
+    elif kind == "domain":
+        username = None
+    else:
+        email = domain = None
+    return BreachHit(src_name, email, username, domain, password, password_hash, salt, label)
+
+def _group_targets(targets: Iterable[str], subdomains: bool = False) -> dict[str, set[str]]:
+    groups = {"email": set(), "domain": set(), "subdomain": set(), "username": set(), "pattern": set()}
+    for target in targets:
+        t = _norm(target or "")
+        if t and is_pattern(t):
+            groups["pattern"].add(t)
+        elif t:
+            kind = _classify(t)
+            groups["subdomain" if subdomains and kind == "domain" else kind].add(t)
+    return groups
+
+def _domain_tree(d: str, tree: set[str]) -> list[str]:
+    """Targets in `tree` that equal `d` or are a parent domain of it."""
+    out = []
+    while d:
+        if d in tree:
+            out.append(d)
+        d = d.partition(".")[2]
+    return out
+
+def _match_row(src_name: str, row: tuple, groups: dict[str, set[str]], matches: list):
+    # Parsers hand over stripped values, so lower() is the whole normalisation,
+    # and nothing is allocated for a row until one of its keys is in a set.
+    email, username, domain = row[0], row[1], row[2]
+    if email:
+        email = email.lower()
+        if email in groups["email"]:
+            matches.append((email, _make_hit(src_name, row, "email")))
+    domains, tree = groups["domain"], groups["subdomain"]
+    if domains or tree:
+        domain = domain.lower() if domain else ""
+        edomain = email.rpartition("@")[2] if email and "@" in email else ""
+        if domain and domain in domains:
+            matches.append((domain, _make_hit(src_name, row, "domain")))
+        if edomain and edomain != domain and edomain in domains:
+            matches.append((edomain, _make_hit(src_name, row, "domain")))
+        if tree:
+            for t in dict.fromkeys(_domain_tree(domain, tree) + _domain_tree(edomain, tree)):
+                matches.append((t, _make_hit(src_name, row, "domain")))
+    if username:
+        username = username.lower()
+        if username in groups["username"]:
+            matches.append((username, _make_hit(src_name, row, "username")))
+    for p in groups["pattern"]:
+        if _pattern_match(p, row):
+            matches.append((p, _make_hit(src_name, row, _pattern_kind(p))))
 
+def _levenshtein(a: str, b: str, k: int) -> int | None:
+    """Edit distance between a and b if it is <= k, else None (banded, early exit)."""
+    if abs(len(a) - len(b)) > k:
+        return None
+    if a == b:
+        return 0
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        lo, hi = max(1, i - k), min(len(b), i + k)
+        cur = [i] + [k + 1] * len(b)
+        for j in range(lo, hi + 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != b[j - 1]))
+        if min(cur[max(0, lo - 1):hi + 1]) > k:
+            return None
+        prev = cur
+    return prev[-1] if prev[-1] <= k else None
+
+_UTF16_32_BOMS = (b"\xff\xfe", b"\xfe\xff", b"\x00\x00\xfe\xff")
+_MMAP_CHUNK = 16 << 20
+_TICK_ROWS = 4096  # rows between progress/cancel checks
+
+def _mmap_ok(path: str, needles: list[str]) -> bool:
+    if not needles or not all(t.isascii() for t in needles):
+        return False
+    with open(path, "rb") as f:
+        return not f.read(4).startswith(_UTF16_32_BOMS)
+
+def _iter_txt_mmap(path: str, groups: dict[str, set[str]], needles: list[str], cancel=None, on_bytes=None,
+                   start: int = 0, end: int | None = None):
+    """
+    Fast path for plain-text lists: mmaps the file and searches for the
+    lowercased target bytes in newline-aligned chunks (bytes.lower() keeps
+    offsets, so this is a case-insensitive byte search). Only candidate lines
+    are decoded and fed through _iter_txt_stream. Use _mmap_ok() first: files
+    with a UTF-16/32 BOM and non-ASCII targets need the regular text parser.
+    Note: a target split by undecodable bytes inside a line is not found here,
+    whereas the text parser would drop those bytes and match it.
+    start/end restrict the search to a newline-aligned byte range.
+    """
+    src_name = os.path.basename(path)
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if len(needles) == 1:
+                needle = needles[0].encode("ascii")
+                def find(buf, i):
+                    j = buf.find(needle, i)
+                    return (j, j + len(needle)) if j >= 0 else None
+            else:
+                rx = re.compile(b"|".join(re.escape(t.encode("ascii")) for t in needles))
+                def find(buf, i):
+                    m = rx.search(buf, i)
+                    return m.span() if m else None
+            size, pos = len(mm) if end is None else min(end, len(mm)), start
+            while pos < size:
+                if cancel is not None and cancel.is_set():
+                    return
+                stop = mm.find(b"\n", min(pos + _MMAP_CHUNK, size), size)
+                stop = size if stop < 0 else stop + 1
+                low = mm[pos:stop].lower()
+                i = 0
+                while True:
+                    span = find(low, i)
+                    if span is None:
+                        break
+                    # Line boundaries as universal-newline text mode sees them.
+                    ls = low.rfind(b"\n", 0, span[0]) + 1
+                    cr = low.rfind(b"\r", ls, span[0])
+                    if cr >= 0:
+                        ls = cr + 1
+                    le = low.find(b"\n", span[1])
+                    if le < 0:
+                        le = len(low)
+                    cr = low.find(b"\r", span[1], le)
+                    if cr >= 0:
+                        le = cr
+                    matches = []
+                    for row in _iter_txt_stream((mm[pos + ls:pos + le].decode("utf-8", "ignore"),)):
+                        _match_row(src_name, row, groups, matches)
+                    yield from matches
+                    i = le + 1
+                pos = stop
+                if on_bytes: on_bytes(pos)
+
+def _filter_keys(groups: dict[str, set[str]]) -> list[str]:
+    if groups["subdomain"] or groups["pattern"]:
+        return []  # no single key to test; the filter can't rule them out
+    return [k[0] + ":" + t for k in ("email", "domain", "username") for t in groups[k]]
+
+def _iter_scan_path(path: str, groups: dict[str, set[str]], cancel=None, on_bytes=None):
+    """
+    One pass over a source file, yielding (normalized_target, hit) in row
+    order as they are found. on_bytes(n) is called now and then with the
+    number of bytes read so far; cancel (threading.Event-like) stops early.
+    """
+    if path.endswith(COMPILED_EXT):
+        from .breach_compile import lookup
+        yield from lookup(path, groups)
+        return
+    from .breach_bloom import might_contain
+    # Never build a filter here: that is a slow whole-file pass before the
+    # scan proper. The background indexer builds them.
+    if not might_contain(path, _filter_keys(groups), build_missing=False):
+        return
+    if path.lower().endswith(('.txt','.lst','.log')):
+        # Wildcards aren't byte needles; patterns go through the row parser.
+        needles = [] if groups["pattern"] else sorted({t for ts in groups.values() for t in ts}, key=len, reverse=True)
+        try:
+            fast = _mmap_ok(path, needles)
+        except OSError:
+            fast = False
+        if fast:
+            yield from _iter_txt_mmap(path, groups, needles, cancel, on_bytes)
+            return
+    src_name = os.path.basename(path)
+    counter = _CountingReader(path)
+    matches = []
+    for n, row in enumerate(_iter_path(path, counter), 1):
+        _match_row(src_name, row, groups, matches)
+        if matches:
+            yield from matches
+            matches.clear()
+        if n % _TICK_ROWS == 0:
+            if cancel is not None and cancel.is_set():
+                return
+            if on_bytes: on_bytes(counter.count)
+
+def _scan_path(path: str, groups: dict[str, set[str]]) -> list[tuple[str, BreachHit]]:
+    """Whole-file _iter_scan_path(); this is the unit of work sent to worker processes."""
+    return list(_iter_scan_path(path, groups))
+
+# One big source can be spread over several workers too: plain text in
+# newline-aligned byte ranges, .gz text lists at gzip member boundaries
+# (concatenated members, as bgzip or `cat a.gz b.gz` write them). Each range
+# is parsed like a whole file; lines cut at range edges travel back as raw
+# head/tail bytes and are stitched and parsed when the results are merged.
+SPLIT_MIN = 64 << 20  # smaller files aren't worth splitting
+_GZ_MAGIC = b"\x1f\x8b\x08"
+_TXT_EXTS = ('.txt','.lst','.log')
+
+def _txt_cuts(path: str, size: int, parts: int) -> list[int]:
+    cuts = []
+    with open(path, "rb") as f:
+        for i in range(1, parts):
+            f.seek(max(size * i // parts, cuts[-1] if cuts else 0))
+            f.readline()
+            if f.tell() >= size:
+                break
+            if not cuts or f.tell() > cuts[-1]:
+                cuts.append(f.tell())
+    return cuts
+
+def _gz_member_at(mm, pos: int) -> bool:
+    if pos + 10 > len(mm) or mm[pos + 3] & 0xE0:  # full header; reserved flag bits zero
+        return False
+    try:
+        zlib.decompressobj(31).decompress(mm[pos:pos + 65536], 1)
+        return True
+    except zlib.error:
+        return False
+
+def _gz_cuts(path: str, size: int, parts: int) -> list[int]:
+    """Offsets that look like gzip member starts near each 1/parts mark (verified when parsed)."""
+    cuts = []
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for i in range(1, parts):
+            j = mm.find(_GZ_MAGIC, max(size * i // parts, cuts[-1] + 1 if cuts else 1))
+            while j >= 0 and not _gz_member_at(mm, j):
+                j = mm.find(_GZ_MAGIC, j + 1)
+            if j < 0:
+                break
+            cuts.append(j)
+    return cuts
+
+def _split_ranges(path: str, parts: int) -> list[tuple[int, int]] | None:
+    """Byte ranges for parsing `path` in parallel, or None when it stays whole."""
+    size = _size(path)
+    if parts < 2 or size < SPLIT_MIN:
+        return None
+    lower = path.lower()
+    try:
+        if lower.endswith(_TXT_EXTS):
+            cuts = _txt_cuts(path, size, parts)
+        elif lower.endswith('.gz') and _inner_name(os.path.basename(path)).lower().endswith(_TXT_EXTS):
+            cuts = _gz_cuts(path, size, parts)
+        else:
+            return None
+    except (OSError, ValueError):
+        return None
+    bounds = [0] + cuts + [size]
+    return list(zip(bounds, bounds[1:])) if cuts else None
+
+class _Range(io.RawIOBase):
+    """Bytes [start, end) of a file as a raw stream."""
+
+    def __init__(self, path: str, start: int, end: int):
+        self._f = io.FileIO(path, "r")
+        self._f.seek(start)
+        self.left = end - start
+
+    def readable(self): return True
+
+    def readinto(self, b):
+        n = self._f.readinto(memoryview(b)[:min(len(b), self.left)]) if self.left > 0 else 0
+        self.left -= n or 0
+        return n
+
+    def close(self):
+        self._f.close()
+        super().close()
+
+class _WholeLines(io.RawIOBase):
+    """
+    Passes on complete lines of `src` only: the bytes up to its first newline
+    are kept back as .head and those after its last newline as .tail.
+    .newline is False when `src` had none at all (then it is all .head).
+    """
+
+    def __init__(self, src):
+        self.src = src
+        self.buf, self.pos = b"", 0
+        self.head, self.tail, self.newline = None, b"", False
+
+    def readable(self): return True
+
+    def _fill(self) -> bool:
+        data = self.src.read(1 << 16)
+        if data:
+            self.buf = self.buf[self.pos:] + data
+            self.pos = 0
+        return bool(data)
+
+    def readinto(self, b):
+        while self.head is None:
+            i = self.buf.find(b"\n", self.pos)
+            if i >= 0:
+                self.head, self.newline, self.pos = self.buf[self.pos:i + 1], True, i + 1
+            elif not self._fill():
+                self.head, self.buf, self.pos = self.buf[self.pos:], b"", 0
+        while True:
+            last = self.buf.rfind(b"\n", self.pos)
+            if last >= 0:
+                n = min(len(b), last + 1 - self.pos)
+                b[:n] = self.buf[self.pos:self.pos + n]
+                self.pos += n
+                return n
+            if not self._fill():
+                self.tail, self.buf, self.pos = self.buf[self.pos:], b"", 0
+                return 0
+
+def _match_lines(src_name: str, data: bytes, groups: dict[str, set[str]]) -> list:
     matches = []
-    for path in load_sources():
-        src_name = os.path.basename(path)
-        for row in _iter_path(path) or []:
-            hit = { "source": src_name }
-            email = _norm(row.get("email","")) if row.get("email") else ""
-            username = _norm(row.get("username","")) if row.get("username") else ""
-            domain = _norm(row.get("domain","")) if row.get("domain") else ""
-            if row.get("password"): hit["password"] = row["password"]
-            if row.get("password_hash"): hit["password_hash"] = row["password_hash"]
-            if row.get("salt"): hit["salt"] = row["salt"]
-            if row.get("source"): hit["src_label"] = row["source"]
-
-            matched = False
-            if is_email:
-                if email == t:
-                    matched = True
-                    hit["email"] = row.get("email")
-            elif is_domain:
-                if domain == t or (email and email.endswith("@"+t)):
-                    matched = True
-                    if domain: hit["domain"] = row.get("domain")
-                    if email: hit["email"] = row.get("email")
+    if data:
+        for row in _iter_txt_stream(io.TextIOWrapper(io.BytesIO(data), encoding="utf-8", errors="ignore")):
+            _match_row(src_name, row, groups, matches)
+    return matches
+
+def _scan_range(path: str, start: int, end: int, groups: dict[str, set[str]]) -> tuple[bytes, list, bytes, bool]:
+    """
+    Worker task for one _split_ranges() range of a text source:
+    (head, [(normalized_target, hit)] for the lines in between, tail, newline seen).
+    """
+    src_name = os.path.basename(path)
+    if not path.lower().endswith('.gz'):
+        needles = [] if groups["pattern"] else sorted({t for ts in groups.values() for t in ts}, key=len, reverse=True)
+        if _mmap_ok(path, needles):
+            # Text ranges are newline-aligned, so there is nothing to stitch.
+            return b"", list(_iter_txt_mmap(path, groups, needles, start=start, end=end)), b"", True
+    with io.BufferedReader(_Range(path, start, end)) as raw:
+        src = gzip.GzipFile(fileobj=raw, mode="rb") if path.lower().endswith('.gz') else raw
+        lines = _WholeLines(src)
+        matches = []
+        for row in _iter_txt_stream(io.TextIOWrapper(io.BufferedReader(lines), encoding="utf-8", errors="ignore")):
+            _match_row(src_name, row, groups, matches)
+        return lines.head, matches, lines.tail, lines.newline
+
+def _stitch(src_name: str, parts: list[tuple], groups: dict[str, set[str]]) -> list:
+    """Merges _scan_range() results in order, parsing the lines cut at range edges."""
+    out, carry = [], b""
+    for head, matches, tail, newline in parts:
+        if not newline:
+            carry += head
+            continue
+        out.extend(_match_lines(src_name, carry + head, groups))
+        out.extend(matches)
+        carry = tail
+    out.extend(_match_lines(src_name, carry, groups))
+    return out
+
+def _worker_count(workers: int | None) -> int:
+    if workers == 0:
+        return os.cpu_count() or 1
+    if not workers or workers < 0:
+        return 1
+    return workers
+
+def _size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+_active_scans = 0
+_active_lock = threading.Lock()
+
+def scans_active() -> bool:
+    """True while a foreground scan is running; background indexing backs off meanwhile."""
+    return _active_scans > 0
+
+@contextlib.contextmanager
+def _foreground():
+    global _active_scans
+    with _active_lock:
+        _active_scans += 1
+    try:
+        yield
+    finally:
+        with _active_lock:
+            _active_scans -= 1
+
+def _iter_groups(groups: dict[str, set[str]], use_index: bool = True, workers: int = 1, cancel=None, progress=None,
+                 indexing=None):
+    """
+    Yields (normalized_target, hit) across load_sources() in source order.
+    Indexed files are answered from the index; the rest are streamed, on a
+    process pool (largest files first) when workers > 1.
+    progress(bytes_done, bytes_total) is called as sources are read, and
+    indexing(path) before a source is (re)indexed.
+    """
+    with _foreground():
+        paths = load_sources()
+        if not any(groups.values()) or not paths:
+            return
+        cancelled = lambda: cancel is not None and cancel.is_set()
+        sizes = {p: _size(p) for p in paths}
+        total, done = sum(sizes.values()), 0
+        def report(current: int = 0):
+            if progress: progress(min(done + current, total), total)
+
+        indexed: set[str] = set()
+        if use_index:
+            from .breach_index import ensure_index, iter_lookup
+            indexed = set(ensure_index([p for p in paths if not p.endswith(COMPILED_EXT)], cancel=cancel, progress=indexing))
+            if cancelled():
+                return
+            queries = [(t, kind) for kind, ts in groups.items() for t in ts]
+
+        streamed = [p for p in paths if p not in indexed and not p.endswith(COMPILED_EXT)]
+        pool, futures, split, skipped = None, {}, {}, set()
+        if workers > 1:
+            from .breach_bloom import might_contain
+            for p in streamed:
+                ranges = _split_ranges(p, workers)
+                if ranges:
+                    # Building a missing filter would mean a whole sequential pass; skip that here.
+                    if might_contain(p, _filter_keys(groups), build_missing=False):
+                        split[p] = ranges
+                    else:
+                        skipped.add(p)
+            tasks = [(sizes[p], p, None) for p in streamed if p not in split and p not in skipped]
+            tasks += [(e - s, p, (s, e)) for p, rs in split.items() for s, e in rs]
+        if workers > 1 and len(tasks) > 1:
+            try:
+                pool = ProcessPoolExecutor(max_workers=min(workers, len(tasks)))
+                for _n, p, r in sorted(tasks, key=lambda x: x[0], reverse=True):
+                    fut = pool.submit(_scan_range, p, r[0], r[1], groups) if r else pool.submit(_scan_path, p, groups)
+                    futures.setdefault(p, []).append((r, fut))
+                for p in futures:
+                    futures[p].sort(key=lambda x: x[0] or (0, 0))
+            except (OSError, RuntimeError, NotImplementedError):
+                # No usable process pool here (frozen/sandboxed env): stay sequential.
+                if pool: pool.shutdown(wait=False, cancel_futures=True)
+                pool, futures = None, {}
+        try:
+            for path in paths:
+                if cancelled():
+                    return
+                if path in indexed:
+                    # Straight from the cursor: nothing is collected per file.
+                    for n, (_pos, t, hit) in enumerate(iter_lookup(path, queries), 1):
+                        yield t, hit
+                        if n % _TICK_ROWS == 0 and cancelled():
+                            return
+                elif path in skipped:
+                    pass
+                elif path in futures:
+                    futs = [f for _r, f in futures[path]]
+                    while not all(f.done() for f in futs):
+                        if cancelled():
+                            return
+                        futures_wait(futs, timeout=0.2)
+                    try:
+                        if path in split:
+                            found = _stitch(os.path.basename(path), [f.result() for f in futs], groups)
+                        else:
+                            found = futs[0].result()
+                    except (OSError, RuntimeError, EOFError, zlib.error):
+                        # Worker died (BrokenProcessPool) or a guessed gzip member
+                        # boundary was wrong: scan this file here instead.
+                        found = _iter_scan_path(path, groups, cancel, report)
+                    yield from found
+                else:
+                    yield from _iter_scan_path(path, groups, cancel, report)
+                done += sizes[path]
+                report()
+        finally:
+            # Reap the workers once nothing is running: a process that exits via
+            # os._exit (e.g. a multiprocessing child) never tells an abandoned
+            # pool to stop and then blocks joining its workers.
+            if pool: pool.shutdown(wait=all(f.done() for fs in futures.values() for _r, f in fs), cancel_futures=True)
+
+def _collect(groups: dict[str, set[str]], use_index: bool, workers: int, cancel=None, progress=None) -> dict[str, list]:
+    found: dict[str, list] = {t: [] for ts in groups.values() for t in ts}
+    for t, hit in _iter_groups(groups, use_index, workers, cancel, progress):
+        found[t].append(hit)
+    return found
+
+def scan_iter(target: str, use_index: bool = True, workers: int = 1, subdomains: bool = False,
+              limit: int | None = None, stop_after_first: bool = False, cancel=None, progress=None, indexing=None):
+    """
+    Generator version of scan(): yields hits as soon as they are found.
+    limit / stop_after_first end the scan early, `cancel` (anything with
+    is_set(), e.g. threading.Event) aborts it between rows, and
+    progress(bytes_done, bytes_total) reports how far through the enabled
+    sources it is; indexing(path) is called before a source is (re)indexed
+    on the way. subdomains=True widens domain targets as scan_domain() does.
+    """
+    t = _norm(target or "")
+    if not t:
+        return
+    if stop_after_first:
+        limit = 1
+    gen = _iter_groups(_group_targets([t], subdomains), use_index, _worker_count(workers), cancel, progress, indexing)
+    try:
+        n = 0
+        for _t, hit in gen:
+            yield hit
+            n += 1
+            if limit and n >= limit:
+                return
+    finally:
+        gen.close()
+
+EXPORT_FIELDS = BreachHit.__slots__
+
+def export_hits(hits: Iterable, path: str, fmt: str | None = None) -> int:
+    """
+    Writes hits to `path` as they arrive, as CSV (with a header row) or JSON
+    Lines; fmt ("csv" / "jsonl") defaults from the extension, and a trailing
+    .gz compresses the output. Nothing is kept beyond the writer's buffer.
+    The file is written under a temporary name and renamed when done.
+    Returns the number of hits written.
+    """
+    lower = path.lower()
+    gz = lower.endswith(".gz")
+    base = lower[:-3] if gz else lower
+    fmt = fmt or ("jsonl" if base.endswith((".jsonl", ".ndjson", ".json")) else "csv")
+    if fmt not in ("csv", "jsonl"):
+        raise ValueError(f"unsupported export format: {fmt}")
+    tmp = path + ".part"
+    n = 0
+    try:
+        with (gzip.open if gz else open)(tmp, "wt", encoding="utf-8", newline="") as f:
+            if fmt == "csv":
+                w = csv.writer(f)
+                w.writerow(EXPORT_FIELDS)
+                for h in hits:
+                    w.writerow([h.get(k, "") for k in EXPORT_FIELDS])
+                    n += 1
+            else:
+                for h in hits:
+                    f.write(json.dumps(h.to_dict(), ensure_ascii=False) + "\n")
+                    n += 1
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return n
+
+def export_scan(target: str, path: str, fmt: str | None = None, use_index: bool = True, workers: int = 1,
+                subdomains: bool = False, cancel=None, progress=None) -> int:
+    """
+    Streams every scan_iter() hit for `target` (wildcards included, no paging)
+    straight into an export file; see export_hits(). A cancelled scan leaves
+    the hits found so far. Returns the number written.
+    """
+    return export_hits(scan_iter(target, use_index, workers, subdomains, cancel=cancel, progress=progress), path, fmt)
+
+def _iter_resumable(groups: dict[str, set[str]], use_index: bool, cursor=None, cancel=None, progress=None):
+    """
+    Sequential _iter_groups() that yields (cursor, hit); the cursor
+    (path, mode, position) resumes right behind that hit. Sources before the
+    cursor's are skipped outright. Indexed and compiled files resume through
+    their keyset positions. A streamed file is re-read and its first
+    `position` hits dropped. A file keeps the mode it had when the cursor was
+    taken, even if the background indexer has finished it since.
+    cancel / progress work as for _iter_groups().
+    """
+    with _foreground():
+        paths = load_sources()
+        if cursor is not None:
+            if cursor[0] not in paths:
+                return
+            paths = paths[paths.index(cursor[0]):]
+        cancelled = lambda: cancel is not None and cancel.is_set()
+        sizes = {p: _size(p) for p in paths}
+        total, done = sum(sizes.values()), 0
+        def report(current: int = 0):
+            if progress: progress(min(done + current, total), total)
+        ready = set()
+        if use_index:
+            from .breach_index import ensure_index, iter_lookup
+            ready = set(ensure_index([p for p in paths if not p.endswith(COMPILED_EXT)], cancel=cancel))
+        queries = [(t, kind) for kind, ts in groups.items() for t in ts]
+        for path in paths:
+            if cancelled():
+                return
+            after = None
+            if cursor is not None and path == cursor[0]:
+                mode, after = cursor[1], cursor[2]
             else:
-                if username == t:
-                    matched = True
-                    hit["username"] = row.get("username")
+                mode = "compiled" if path.endswith(COMPILED_EXT) else "index" if path in ready else "stream"
+            if mode == "compiled":
+                from .breach_compile import iter_lookup as compiled_lookup
+                for pos, _t, hit in compiled_lookup(path, groups, after):
+                    yield (path, mode, pos), hit
+            elif mode == "index":
+                if path in ready:
+                    for pos, _t, hit in iter_lookup(path, queries, after, batch=_PAGE_BATCH):
+                        yield (path, mode, pos), hit
+            else:
+                for n, (_t, hit) in enumerate(_iter_scan_path(path, groups, cancel, report), 1):
+                    if after is None or n > after:
+                        yield (path, mode, n), hit
+            done += sizes[path]
+            report()
+
+_PAGE_BATCH = 256  # index rows fetched per query while paging
 
-            if matched:
-                matches.append(hit)
+def scan_page(target: str, cursor=None, limit: int = 100, use_index: bool = True, cancel=None, progress=None):
+    """
+    One page of scan_iter() results: (hits, next_cursor), next_cursor None on
+    the last page. Pass next_cursor back for the following page; it points
+    into the sources (see _iter_resumable()), so a page never re-reads the
+    matches before it. Meant for wildcard patterns, where a broad query can
+    match millions of rows. A cancelled page is cut short; its cursor still
+    resumes behind the last hit returned.
+    """
+    t = _norm(target or "")
+    if not t:
+        return [], None
+    limit = max(1, limit)
+    hits, last = [], None
+    gen = _iter_resumable(_group_targets([t]), use_index, cursor, cancel, progress)
+    try:
+        for pos, hit in gen:
+            if len(hits) == limit:
+                return hits, last  # one more exists
+            hits.append(hit)
+            last = pos
+    finally:
+        gen.close()
+    if cancel is not None and cancel.is_set():
+        return hits, last
+    return hits, None
 
+def scan(target: str, use_index: bool = True, workers: int = 1):
+    """
+    Returns (count, hits) for an email, domain or username across all enabled
+    sources; targets containing * or ? are wildcard patterns (see
+    scan_page()). With use_index the persistent index in BREACH_DIR answers the
+    query (files are re-indexed only when their size/mtime changes); files
+    that are streamed instead are spread over `workers` processes
+    (0 = one per CPU core). Hits always come back in source order.
+    """
+    matches = list(scan_iter(target, use_index, workers))
     return len(matches), matches
 
+def scan_many(targets: Iterable[str], use_index: bool = True, workers: int = 1,
+              cancel=None, progress=None) -> dict[str, list]:
+    """
+    Batch version of scan(): classifies every target once and answers all of
+    them with a single pass over the sources (or the index).
+    Returns {target: hits}, keyed by the targets as given (blank ones dropped);
+    cancel / progress as for scan_iter(), a cancelled scan returns what it found.
+    """
+    targets = [t.strip() for t in targets if t and t.strip()]
+    found = _collect(_group_targets(targets), use_index, _worker_count(workers), cancel, progress)
+    return {target: found.get(_norm(target), []) for target in targets}
+
+def scan_domain(domain: str, include_subdomains: bool = True, use_index: bool = True, workers: int = 1):
+    """
+    Returns (count, hits) for every account under `domain`: rows whose domain
+    or email domain is the domain itself or, with include_subdomains, any
+    subdomain of it (corp.com also pulls mail.corp.com). Served from the
+    index's reversed-label column as a range scan.
+    """
+    t = _norm(domain or "").lstrip("@")
+    if not t:
+        return 0, []
+    matches = list(scan_iter(t, use_index, workers, subdomains=include_subdomains))
+    return len(matches), matches
 
-import os, csv, json, gzip, zipfile, io, re
-SUPPORTED_EXT = {".txt", ".csv", ".json", ".gz", ".zip"}
+def scan_fuzzy(target: str, max_distance: int = 1, use_index: bool = True, cancel=None, progress=None):
+    """
+    Returns (count, hits) for usernames and email local parts within
+    `max_distance` edits of `target` (jsmith ~ j.smith ~ jsmith1), closest
+    first. For an email target only the local part is fuzzy and the domain
+    must match. Indexed sources get candidates from the trigram index;
+    anything else (compiled files, use_index=False) is checked row by row.
+    cancel / progress as for scan_iter(); a cancelled scan returns what it found.
+    """
+    t = _norm(target or "")
+    if not t:
+        return 0, []
+    k = max(0, int(max_distance))
+    local, at, dom = t.rpartition("@") if "@" in t else ("", "", "")
+    term = local if at else t
+    if not term:
+        return 0, []
+    with _foreground():
+        paths = load_sources()
+        found = []  # (distance, source order, row order, hit)
+        cancelled = lambda: cancel is not None and cancel.is_set()
+        sizes = {p: _size(p) for p in paths}
+        total, done = sum(sizes.values()), 0
 
-def import_folder(folder: str):
-    """Copy supported files from folder recursively into breaches dir."""
-    out = []
-    dest_dir = os.path.join(os.path.dirname(__file__), "breaches")
-    os.makedirs(dest_dir, exist_ok=True)
-    for root, dirs, files in os.walk(folder):
-        for name in files:
-            if any(name.lower().endswith(e) for e in SUPPORTED_EXT):
-                src = os.path.join(root, name)
-                dst = os.path.join(dest_dir, name)
-                try:
-                    if os.path.abspath(src) != os.path.abspath(dst):
-                        import shutil
-                        shutil.copy2(src, dst)
-                    out.append((name, "ok"))
-                except Exception as e:
-                    out.append((name, f"error: {e}"))
-    return out
+        indexed: dict[str, dict[str, list]] = {}
+        dist: dict[str, int] = {}
+        if use_index:
+            from .breach_index import ensure_index, fuzzy_terms, lookup_many
+            ready = ensure_index([p for p in paths if not p.endswith(COMPILED_EXT)], cancel=cancel)
+            if ready and not cancelled():
+                dist = fuzzy_terms(ready, term, k)
+                queries = [(c, "local") for c in dist] + ([] if at else [(c, "username") for c in dist])
+                indexed = lookup_many(ready, queries)
+        for si, path in enumerate(paths):
+            if cancelled():
+                break
+            if progress: progress(done, total)
+            base, done = done, done + sizes[path]
+            if path in indexed:
+                for c, hits in indexed[path].items():
+                    for ri, hit in enumerate(hits):
+                        if at and (hit.email or "").lower().rpartition("@")[2] != dom:
+                            continue
+                        found.append((dist[c], si, ri, hit))
+                continue
+            src_name = os.path.basename(path)
+            if src_name.endswith(COMPILED_EXT):
+                src_name = src_name[:-len(COMPILED_EXT)]
+            counter = None if path.endswith(COMPILED_EXT) else _CountingReader(path)
+            for ri, row in enumerate(_iter_path(path, counter)):
+                if ri % _TICK_ROWS == _TICK_ROWS - 1:
+                    if cancelled():
+                        break
+                    if progress and counter: progress(base + counter.count, total)
+                email, username = row[0], row[1]
+                if email and "@" in email:
+                    el, _, ed = email.lower().rpartition("@")
+                    if not at or ed == dom:
+                        d = _levenshtein(term, el, k)
+                        if d is not None:
+                            found.append((d, si, ri, _make_hit(src_name, row, "email")))
+                if username and not at:
+                    d = _levenshtein(term, username.lower(), k)
+                    if d is not None:
+                        found.append((d, si, ri, _make_hit(src_name, row, "username")))
+        if progress and not cancelled(): progress(total, total)
+    found.sort(key=lambda x: x[:3])
+    return len(found), [h for *_k, h in found]
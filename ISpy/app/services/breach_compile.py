@@ -0,0 +1,333 @@
+
+import heapq
+import json
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+
+from .breach_check import COMPILED_EXT, _iter_path, _make_hit, _pattern_match, pattern_plan
+from .breach_index import _LABEL_NEXT, _TOP, reverse_domain
+
+# Compiled source layout (all offsets little-endian):
+#   header | records | keys | table
+# header:  magic(8) | source size(Q) | source mtime_ns(q) | n_records(Q) | n_keys(Q)
+#          | records pos(Q) | keys pos(Q) | table pos(Q)
+# records: one JSON array per line (ROW_FIELDS order), deduplicated and sorted
+#          by the record's normalized key
+# keys:    "<key>\0" + record offset(Q) per entry, sorted by key then offset
+#          e:<email>  u:<username>  d:<reversed domain>  m:<reversed email domain>
+# table:   n_keys fixed-width (Q) offsets into keys, for the binary search
+MAGIC = b"ISPYIDX1"
+_HEADER = struct.Struct("<8sQqQQQQQ")
+_Q = struct.Struct("<Q")
+
+RUN_LINES = 200_000  # lines per sorted run held in memory while compiling
+
+
+def compiled_path(path: str) -> str:
+    return path + COMPILED_EXT
+
+
+def _clean(s: str) -> str:
+    return s.replace("\0", "").replace("\n", "").replace("\r", "")
+
+
+class _ExternalSort:
+    """Sorts and deduplicates byte lines with bounded memory (sorted runs + heap merge)."""
+
+    def __init__(self, tmpdir: str, run_lines: int = RUN_LINES):
+        self.tmpdir, self.run_lines = tmpdir, run_lines
+        self.buf: list[bytes] = []
+        self.runs: list[str] = []
+
+    def add(self, line: bytes):
+        self.buf.append(line)
+        if len(self.buf) >= self.run_lines:
+            self._spill()
+
+    def _spill(self):
+        fd, name = tempfile.mkstemp(suffix=".run", dir=self.tmpdir)
+        with os.fdopen(fd, "wb") as f:
+            f.writelines(sorted(set(self.buf)))
+        self.runs.append(name)
+        self.buf = []
+
+    def __iter__(self):
+        if self.runs:
+            if self.buf:
+                self._spill()
+            files = [open(r, "rb") for r in self.runs]
+            merged = heapq.merge(*files)
+        else:
+            files, merged = [], iter(sorted(set(self.buf)))
+            self.buf = []
+        try:
+            last = None
+            for line in merged:
+                if line != last:
+                    yield line
+                    last = line
+        finally:
+            for f in files:
+                f.close()
+            for r in self.runs:
+                os.remove(r)
+            self.runs = []
+
+
+def _primary_key(row: tuple) -> str:
+    email, username, domain = row[0], row[1], row[2]
+    if email:
+        return "e:" + email.lower()
+    if username:
+        return "u:" + username.lower()
+    if domain:
+        return "d:" + reverse_domain(domain.lower())
+    return ""
+
+
+def _record_keys(row: tuple):
+    email, username, domain = row[0], row[1], row[2]
+    if email:
+        e = email.lower()
+        yield "e:" + e
+        if "@" in e:
+            yield "m:" + reverse_domain(e.rpartition("@")[2])
+    if username:
+        yield "u:" + username.lower()
+    if domain:
+        yield "d:" + reverse_domain(domain.lower())
+
+
+def compile_source(path: str, out: str | None = None, run_lines: int = RUN_LINES) -> str:
+    """
+    Compiles a breach source (any format _iter_path reads) into a sorted,
+    deduplicated .ispyidx next to it (or at `out`). Both sort passes go
+    through sorted runs on disk, so sources larger than RAM compile fine.
+    Returns the compiled path.
+    """
+    st = os.stat(path)
+    out = out or compiled_path(path)
+    tmpdir = tempfile.mkdtemp(prefix="_compile", dir=os.path.dirname(os.path.abspath(out)))
+    tmp = out + ".tmp"
+    try:
+        records = _ExternalSort(tmpdir, run_lines)
+        for row in _iter_path(path):
+            key = _clean(_primary_key(row))
+            records.add(key.encode("utf-8") + b"\0" + json.dumps(list(row), ensure_ascii=False).encode("utf-8") + b"\n")
+
+        keys = _ExternalSort(tmpdir, run_lines)
+        with open(tmp, "wb") as f:
+            f.write(b"\0" * _HEADER.size)
+            rec_pos, n_records = f.tell(), 0
+            for line in records:
+                off = f.tell() - rec_pos
+                data = line[line.index(b"\0") + 1:]
+                f.write(data)
+                n_records += 1
+                for k in _record_keys(json.loads(data)):
+                    keys.add(_clean(k).encode("utf-8") + b"\0" + b"%016x\n" % off)
+
+            keys_pos, n_keys = f.tell(), 0
+            fd, table_tmp = tempfile.mkstemp(suffix=".tbl", dir=tmpdir)
+            with os.fdopen(fd, "w+b") as table:
+                for line in keys:
+                    key, _, off = line.rstrip(b"\n").partition(b"\0")
+                    table.write(_Q.pack(f.tell() - keys_pos))
+                    f.write(key + b"\0" + _Q.pack(int(off, 16)))
+                    n_keys += 1
+                table_pos = f.tell()
+                table.seek(0)
+                shutil.copyfileobj(table, f)
+            f.seek(0)
+            f.write(_HEADER.pack(MAGIC, st.st_size, st.st_mtime_ns, n_records, n_keys, rec_pos, keys_pos, table_pos))
+        os.replace(tmp, out)
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return out
+
+
+class CompiledSource:
+    """A mmapped .ispyidx; look keys up with range() / records()."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, self.src_size, self.src_mtime_ns, self.n_records, self.n_keys,
+         self.rec_pos, self.keys_pos, self.table_pos) = _HEADER.unpack(self.mm[:_HEADER.size])
+        if magic != MAGIC:
+            self.mm.close()
+            raise ValueError("not a compiled breach source: " + path)
+
+    def close(self):
+        self.mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _entry(self, i: int) -> tuple[bytes, int]:
+        start = self.keys_pos + _Q.unpack_from(self.mm, self.table_pos + 8 * i)[0]
+        end = self.mm.find(b"\0", start)
+        return self.mm[start:end], _Q.unpack_from(self.mm, end + 1)[0]
+
+    def _lower_bound(self, key: bytes) -> int:
+        lo, hi = 0, self.n_keys
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._entry(mid)[0] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def iter_range(self, lo: str, hi: str | None = None, start: int = 0):
+        """
+        Yields (key number, record offset) for key == lo, or lo <= key < hi
+        when hi is given, in key order; start skips to a key number.
+        """
+        lo_b = lo.encode("utf-8")
+        hi_b = hi.encode("utf-8") if hi is not None else None
+        for i in range(max(start, self._lower_bound(lo_b)), self.n_keys):
+            key, off = self._entry(i)
+            if (key != lo_b) if hi_b is None else (key >= hi_b):
+                break
+            yield i, off
+
+    def range(self, lo: str, hi: str | None = None) -> list[int]:
+        """Record offsets for key == lo, or lo <= key < hi when hi is given."""
+        return [off for _i, off in self.iter_range(lo, hi)]
+
+    def record(self, off: int) -> tuple:
+        start = self.rec_pos + off
+        return tuple(json.loads(self.mm[start:self.mm.find(b"\n", start)]))
+
+    def records(self):
+        pos = self.rec_pos
+        while pos < self.keys_pos:
+            end = self.mm.find(b"\n", pos)
+            yield tuple(json.loads(self.mm[pos:end]))
+            pos = end + 1
+
+
+def record_count(path: str) -> int | None:
+    """Number of records from the header alone, or None if `path` isn't compiled."""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(_HEADER.size)
+        if len(head) == _HEADER.size and head[:8] == MAGIC:
+            return _HEADER.unpack(head)[3]
+    except OSError:
+        pass
+    return None
+
+
+def iter_records(path: str):
+    """Every record of a compiled source as a ROW_FIELDS tuple, in key order."""
+    with CompiledSource(path) as c:
+        yield from c.records()
+
+
+def _spans(t: str, kind: str) -> list[tuple[str, str | None]]:
+    """Key spans (lo, hi) holding the candidates for one target; hi None = exact key."""
+    if kind == "email":
+        return [("e:" + t, None)]
+    if kind == "username":
+        return [("u:" + t, None)]
+    if kind in ("domain", "subdomain"):
+        r = reverse_domain(t)
+        out = []
+        for tag in ("d:", "m:"):
+            out.append((tag + r, None))
+            if kind == "subdomain":
+                out.append((tag + r + ".", tag + r + _LABEL_NEXT))
+        return out
+    return _pattern_spans(t)
+
+
+def _pattern_spans(p: str) -> list[tuple[str, str | None]]:
+    """Candidate key spans for a wildcard pattern: the narrowest range it pins down."""
+    kind, prefix, exact, suffix = pattern_plan(p)
+    def under(tag, d):
+        r = reverse_domain(d)
+        return (tag + r + ".", tag + r + _LABEL_NEXT)
+    if kind == "email":
+        if prefix:
+            return [("e:" + prefix, "e:" + prefix + _TOP)]
+        if exact:
+            return [("m:" + reverse_domain(exact), None)]
+        if suffix:
+            return [under("m:", suffix)]
+        return [("e:", "e;")]
+    if kind == "username":
+        return [("u:" + prefix, "u:" + prefix + _TOP) if prefix else ("u:", "u;")]
+    if suffix:
+        return [under("d:", suffix), under("m:", suffix)]
+    return [("d:", "d;"), ("m:", "m;")]
+
+
+def _in_span(key: str, span: tuple[str, str | None]) -> bool:
+    lo, hi = span
+    return key == lo if hi is None else lo <= key < hi
+
+
+def iter_lookup(path: str, groups: dict[str, set[str]], after: tuple[int, int, int] | None = None):
+    """
+    Binary-search counterpart of the row matcher for a compiled source:
+    lazily yields (position, normalized_target, hit) for the
+    _group_targets() groups, walking each target's key spans in key order.
+    A record reached again through a later span is skipped, so nothing is
+    collected up front. position is (target number, span, key number); pass
+    a yielded one as `after` to resume right behind it.
+    """
+    src_name = os.path.basename(path)[:-len(COMPILED_EXT)]
+    queries = [(t, kind) for kind in ("email", "domain", "subdomain", "username", "pattern") for t in sorted(groups.get(kind, ()))]
+    with CompiledSource(path) as c:
+        for qi, (t, kind) in enumerate(queries):
+            if after is not None and qi < after[0]:
+                continue
+            hit_kind = pattern_plan(t)[0] if kind == "pattern" else "domain" if kind == "subdomain" else kind
+            spans = _spans(t, kind)
+            for si, span in enumerate(spans):
+                start = 0
+                if after is not None and qi == after[0]:
+                    if si < after[1]:
+                        continue
+                    if si == after[1]:
+                        start = after[2] + 1
+                for ki, off in c.iter_range(span[0], span[1], start):
+                    row = c.record(off)
+                    if si and any(_in_span(_clean(k), sp) for k in _record_keys(row) for sp in spans[:si]):
+                        continue
+                    if kind == "pattern" and not _pattern_match(t, row):
+                        continue
+                    yield (qi, si, ki), t, _make_hit(src_name, row, hit_kind)
+
+
+def lookup(path: str, groups: dict[str, set[str]]):
+    """iter_lookup() without the positions: yields (normalized_target, hit)."""
+    for _pos, t, hit in iter_lookup(path, groups):
+        yield t, hit
+
+
+def compile_all(paths: list[str]) -> list[tuple[str, str]]:
+    """Compiles each source; returns [(name, "ok" | error)] for the UI."""
+    res = []
+    for p in paths:
+        name = os.path.basename(p)
+        if p.endswith(COMPILED_EXT):
+            res.append((name, "already compiled"))
+            continue
+        try:
+            compile_source(p)
+            res.append((name, "ok"))
+        except Exception as e:
+            res.append((name, f"error: {e}"))
+    return res
@@ -0,0 +1,238 @@
+
+import contextlib
+import hashlib
+import heapq
+import json
+import os
+
+from . import breach_check
+from .breach_check import SOURCE_EXTS, _iter_path
+
+# _manifest.json in BREACH_DIR records, per imported source:
+#   size, mtime_ns   – to tell when a cached entry is stale
+#   blake2b          – digest of the file's bytes; identical packs are refused
+#   sketch           – bottom-k hashes of its normalized rows, for overlap estimates
+#   overlaps         – {older source: estimated overlap} for those >= OVERLAP_REPORT
+# Sketches and overlaps are only computed at import time (one new pack
+# against the existing sketches), so reading the report is cheap. Files that
+# arrived some other way just get a digest.
+MANIFEST_NAME = "_manifest.json"
+SKETCH_K = 256
+OVERLAP_REPORT = 0.5  # report overlaps covering at least this share of the smaller pack
+_CHUNK = 1 << 20
+
+
+def _dir() -> str:
+    return breach_check.BREACH_DIR
+
+
+def _manifest_path() -> str:
+    return os.path.join(_dir(), MANIFEST_NAME)
+
+
+def load_manifest() -> dict:
+    try:
+        with open(_manifest_path(), "r", encoding="utf-8") as f:
+            m = json.load(f)
+        if isinstance(m.get("files"), dict):
+            return m
+    except Exception:
+        pass
+    return {"version": 1, "files": {}}
+
+
+def _save_manifest(m: dict):
+    tmp = _manifest_path() + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(m, f)
+    os.replace(tmp, _manifest_path())
+
+
+def file_digest(path: str) -> str:
+    h = hashlib.blake2b()
+    with open(path, "rb") as f:
+        while chunk := f.read(_CHUNK):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _copy_hashed(fsrc, dest: str) -> str:
+    """Streams fsrc into dest, hashing on the way; returns the hex digest."""
+    h = hashlib.blake2b()
+    with open(dest, "wb") as out:
+        while chunk := fsrc.read(_CHUNK):
+            h.update(chunk)
+            out.write(chunk)
+    return h.hexdigest()
+
+
+def _row_hash(row: tuple) -> int:
+    key = "\x1f".join((v or "").lower() if i < 3 else (v or "") for i, v in enumerate(row[:6]))
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def sketch(path: str, k: int = SKETCH_K) -> list[int]:
+    """Bottom-k sketch: the k smallest distinct row hashes, ascending."""
+    heap: list[int] = []  # negated, so heap[0] is the largest kept hash
+    kept: set[int] = set()
+    for row in _iter_path(path):
+        h = _row_hash(row)
+        if h in kept:
+            continue
+        if len(heap) < k:
+            heapq.heappush(heap, -h)
+            kept.add(h)
+        elif h < -heap[0]:
+            kept.discard(-heapq.heapreplace(heap, -h))
+            kept.add(h)
+    return sorted(kept)
+
+
+def _distinct(s: list[int], k: int = SKETCH_K) -> float:
+    return len(s) if len(s) < k else (k - 1) * (1 << 64) / (s[-1] + 1)
+
+
+def overlap(a: list[int], b: list[int], k: int = SKETCH_K) -> float:
+    """Estimated share of the smaller pack's distinct rows that also occur in the other."""
+    if not a or not b:
+        return 0.0
+    sa, sb = set(a), set(b)
+    union = heapq.nsmallest(k, sa | sb)
+    j = sum(1 for h in union if h in sa and h in sb) / len(union)
+    na, nb = _distinct(a, k), _distinct(b, k)
+    return min(1.0, j * (na + nb) / (1 + j) / min(na, nb))
+
+
+def _refresh(m: dict) -> dict:
+    """Drops entries for removed files and (re)hashes sources the manifest doesn't know yet."""
+    files = m["files"]
+    present = {}
+    try:
+        names = os.listdir(_dir())
+    except OSError:
+        names = []
+    for name in names:
+        if name.startswith("_") or not name.lower().endswith(SOURCE_EXTS):
+            continue
+        path = os.path.join(_dir(), name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        e = files.get(name)
+        if not e or e.get("size") != st.st_size or e.get("mtime_ns") != st.st_mtime_ns:
+            try:
+                e = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "blake2b": file_digest(path)}
+            except OSError:
+                continue
+        present[name] = e
+    m["files"] = present
+    return m
+
+
+def _admit(m: dict, tmp: str, name: str, digest: str) -> str:
+    """Moves a hashed temp copy into place unless an identical pack is already there."""
+    for other, e in m["files"].items():
+        if e.get("blake2b") == digest:
+            os.remove(tmp)
+            return "unchanged" if other == name else f"skipped: identical to {other}"
+    dest = os.path.join(_dir(), name)
+    os.replace(tmp, dest)
+    st = os.stat(dest)
+    entry = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "blake2b": digest}
+    try:
+        entry["sketch"] = sketch(dest)
+    except Exception:
+        pass
+    for e in m["files"].values():
+        e.get("overlaps", {}).pop(name, None)  # a replaced pack's pairs are recomputed below
+    m["files"][name] = entry
+    _add_overlaps(m, name)
+    notes = sorted(((r, o) for o, r in entry.get("overlaps", {}).items()), reverse=True)
+    return "ok" + "".join(f" ({r:.0%} overlap with {o})" for r, o in notes[:3])
+
+
+def _add_overlaps(m: dict, name: str):
+    """Compares one pack's sketch against every other and stores the notable pairs on it."""
+    entry = m["files"][name]
+    if not entry.get("sketch"):
+        return
+    found = {}
+    for other, e in m["files"].items():
+        if other != name and e.get("sketch") and name not in e.get("overlaps", {}):
+            r = overlap(entry["sketch"], e["sketch"])
+            if r >= OVERLAP_REPORT:
+                found[other] = round(r, 4)
+    entry["overlaps"] = found
+
+
+def import_stream(m: dict, fsrc, name: str) -> str:
+    """Imports one readable binary stream as BREACH_DIR/name against manifest `m`."""
+    tmp = os.path.join(_dir(), f"_import_{os.getpid()}_{name}")
+    try:
+        digest = _copy_hashed(fsrc, tmp)
+        return _admit(m, tmp, name, digest)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+@contextlib.contextmanager
+def import_session():
+    """
+    The refreshed manifest to pass to import_stream(), for a batch of
+    imports; it is saved when the block exits, even on error.
+    """
+    os.makedirs(_dir(), exist_ok=True)
+    m = _refresh(load_manifest())
+    for name, e in list(m["files"].items()):
+        if e.get("sketch") and "overlaps" not in e:
+            _add_overlaps(m, name)  # manifests from before overlaps were stored
+    try:
+        yield m
+    finally:
+        _save_manifest(m)
+
+
+def import_files(paths: list[str]) -> list[tuple[str, str]]:
+    """
+    Copies breach packs into BREACH_DIR, hashing them as they stream in.
+    Byte-identical packs are refused; overlapping ones are reported with
+    their estimated overlap. Returns [(name, status)].
+    """
+    out = []
+    with import_session() as m:
+        for src in paths:
+            name = os.path.basename(src)
+            try:
+                if os.path.abspath(src) == os.path.abspath(os.path.join(_dir(), name)):
+                    out.append((name, "already in breaches"))
+                    continue
+                with open(src, "rb") as f:
+                    out.append((name, import_stream(m, f, name)))
+            except Exception as e:
+                out.append((name, f"error: {e}"))
+    return out
+
+
+def import_folder(folder: str) -> list[tuple[str, str]]:
+    """Imports supported files from folder (recursively) via import_files()."""
+    paths = []
+    for root, dirs, files in os.walk(folder):
+        for name in files:
+            if name.lower().endswith(SOURCE_EXTS) and not name.startswith("_"):
+                paths.append(os.path.join(root, name))
+    return import_files(paths)
+
+
+def overlap_report(min_ratio: float = OVERLAP_REPORT) -> list[tuple[str, str, float]]:
+    """
+    Pairs of present sources whose estimated overlap is >= min_ratio, largest
+    first, as stored at import time (pairs below OVERLAP_REPORT aren't kept).
+    Reads the manifest only, so it is cheap enough for the UI thread.
+    """
+    files = load_manifest()["files"]
+    present = {n for n in files if os.path.exists(os.path.join(_dir(), n))}
+    out = [(a, b, r) for a in present for b, r in files[a].get("overlaps", {}).items()
+           if b in present and r >= min_ratio]
+    return sorted(out, key=lambda x: -x[2])
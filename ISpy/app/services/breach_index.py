@@ -0,0 +1,473 @@
+
+import base64
+import binascii
+import os
+import sqlite3
+import threading
+from collections import Counter
+
+from .breach_check import BreachHit, _iter_path, _levenshtein, _pattern_match, pattern_plan
+
+# One index database per breach directory, keyed by file name so the folder
+# can be moved around (portable installs) without invalidating the index.
+INDEX_NAME = "_index.sqlite"
+SCHEMA_VERSION = "6"
+
+_build_lock = threading.Lock()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta(k TEXT PRIMARY KEY, v TEXT);
+CREATE TABLE IF NOT EXISTS files(
+    id INTEGER PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    row_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS records(
+    file_id INTEGER NOT NULL,
+    email_n TEXT, username_n TEXT, rdomain_n TEXT, redomain_n TEXT, hash_n TEXT,
+    email TEXT, username TEXT, domain TEXT,
+    password TEXT, password_hash TEXT, salt TEXT, src_label TEXT
+);
+CREATE INDEX IF NOT EXISTS records_email ON records(email_n, file_id) WHERE email_n IS NOT NULL;
+CREATE INDEX IF NOT EXISTS records_username ON records(username_n, file_id) WHERE username_n IS NOT NULL;
+CREATE INDEX IF NOT EXISTS records_rdomain ON records(rdomain_n, file_id) WHERE rdomain_n IS NOT NULL;
+CREATE INDEX IF NOT EXISTS records_redomain ON records(redomain_n, file_id) WHERE redomain_n IS NOT NULL;
+CREATE INDEX IF NOT EXISTS records_hash ON records(hash_n) WHERE hash_n IS NOT NULL;
+CREATE INDEX IF NOT EXISTS records_file ON records(file_id);
+CREATE TABLE IF NOT EXISTS terms(id INTEGER PRIMARY KEY, term TEXT UNIQUE NOT NULL, len INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS grams(gram TEXT NOT NULL, term_id INTEGER NOT NULL, PRIMARY KEY(gram, term_id)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS gram_df(gram TEXT PRIMARY KEY, n INTEGER NOT NULL) WITHOUT ROWID;
+"""
+
+_COLS = "file_id, email, username, domain, password, password_hash, salt, src_label"
+
+# Domains are stored label-reversed ("mail.corp.com" -> "com.corp.mail") for
+# both the domain column and the domain part of emails, so "corp.com and
+# everything under it" is one equality plus one index range scan.
+_LABEL_NEXT = chr(ord(".") + 1)
+
+
+def reverse_domain(d: str) -> str:
+    return ".".join(reversed(d.split(".")))
+
+
+def index_path(directory: str) -> str:
+    return os.path.join(directory, INDEX_NAME)
+
+
+def _connect(directory: str) -> sqlite3.Connection:
+    con = sqlite3.connect(index_path(directory), timeout=30)
+    con.execute("PRAGMA synchronous=NORMAL")
+    ver = None
+    try:
+        r = con.execute("SELECT v FROM meta WHERE k='schema'").fetchone()
+        ver = r[0] if r else None
+    except sqlite3.Error:
+        pass
+    if ver != SCHEMA_VERSION:
+        # Index is a cache: on any schema change just start over.
+        con.executescript("DROP TABLE IF EXISTS records; DROP TABLE IF EXISTS files; DROP TABLE IF EXISTS meta;"
+                          " DROP TABLE IF EXISTS terms; DROP TABLE IF EXISTS grams; DROP TABLE IF EXISTS gram_df;")
+        con.executescript(_SCHEMA)
+        con.execute("INSERT OR REPLACE INTO meta(k, v) VALUES('schema', ?)", (SCHEMA_VERSION,))
+        con.commit()
+    return con
+
+
+def _fingerprint(path: str) -> tuple[int, int] | None:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+# Unsalted password hashes are kept as lowercase hex in hash_n, so a password
+# check is one equality per candidate digest. The algorithm follows from the
+# length (32: MD5 or NTLM, 40: SHA-1, 64: SHA-256); "0x" and LDAP-style
+# "{SHA}<base64>" spellings are folded into the same form.
+HASH_HEX_LENS = (32, 40, 64)
+
+
+def normalize_hash(h: str | None) -> str | None:
+    if not h:
+        return None
+    h = h.strip()
+    if h.startswith("{") and "}" in h:
+        try:
+            h = base64.b64decode(h.partition("}")[2], validate=True).hex()
+        except (binascii.Error, ValueError):
+            return None
+    elif h[:2] in ("0x", "0X"):
+        h = h[2:]
+    h = h.lower()
+    if len(h) not in HASH_HEX_LENS or h.strip("0123456789abcdef"):
+        return None
+    return h
+
+
+def _row_values(file_id: int, rows):
+    for email, username, domain, password, password_hash, salt, source in rows:
+        email_n = email.lower() if email else None
+        redomain_n = reverse_domain(email_n.rpartition("@")[2]) if email_n and "@" in email_n else None
+        yield (file_id,
+               email_n, username.lower() if username else None, reverse_domain(domain.lower()) if domain else None, redomain_n,
+               None if salt else normalize_hash(password_hash),
+               email, username, domain, password, password_hash, salt, source)
+
+
+# Fuzzy lookups: every distinct username and email local part is a "term",
+# split into padded trigrams. An edit touches at most 3 trigrams, so a term
+# within edit distance k of the target contains at least one of any 3k+1 of
+# the target's trigrams. Candidates come from the 3k+1 rarest postings
+# (gram_df holds the posting sizes, adjusted as terms come and go) and only
+# those are checked with Levenshtein, so common grams ("ser" in every
+# "user...") never get read.
+def trigrams(term: str) -> set[str]:
+    s = "\x02\x02" + term + "\x03\x03"
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+
+def _index_terms(con: sqlite3.Connection, file_id: int):
+    before = con.execute("SELECT COALESCE(MAX(id), 0) FROM terms").fetchone()[0]
+    con.execute("INSERT OR IGNORE INTO terms(term, len) SELECT t, length(t) FROM ("
+                "SELECT username_n AS t FROM records WHERE file_id=? AND username_n IS NOT NULL"
+                " UNION SELECT substr(email_n, 1, instr(email_n, '@') - 1) FROM records WHERE file_id=? AND instr(email_n, '@') > 1)",
+                (file_id, file_id))
+    new = con.execute("SELECT id, term FROM terms WHERE id>?", (before,)).fetchall()
+    df = Counter()
+    for _tid, term in new:
+        df.update(trigrams(term))
+    con.executemany("INSERT OR IGNORE INTO grams VALUES(?,?)", ((g, tid) for tid, term in new for g in trigrams(term)))
+    _add_gram_df(con, df.items())
+
+
+def _add_gram_df(con: sqlite3.Connection, counts):
+    counts = list(counts)
+    con.executemany("INSERT OR IGNORE INTO gram_df VALUES(?, 0)", ((g,) for g, _n in counts))
+    con.executemany("UPDATE gram_df SET n=n+? WHERE gram=?", ((n, g) for g, n in counts))
+
+
+def _prune_terms(con: sqlite3.Connection):
+    """Drops terms (and their grams and gram_df counts) no record refers to any more."""
+    gone = con.execute("SELECT id, term FROM terms WHERE NOT EXISTS (SELECT 1 FROM records WHERE username_n=terms.term)"
+                       " AND NOT EXISTS (SELECT 1 FROM records WHERE email_n>=terms.term||'@' AND email_n<terms.term||'A')").fetchall()
+    if not gone:
+        return
+    df = Counter()
+    for _tid, term in gone:
+        df.update(trigrams(term))
+    _add_gram_df(con, ((g, -n) for g, n in df.items()))
+    con.execute("DELETE FROM gram_df WHERE n<=0")
+    con.executemany("DELETE FROM grams WHERE gram=? AND term_id=?", ((g, tid) for tid, term in gone for g in trigrams(term)))
+    con.executemany("DELETE FROM terms WHERE id=?", ((tid,) for tid, _t in gone))
+
+
+def _index_file(con: sqlite3.Connection, path: str, fp: tuple[int, int], cancel=None) -> int:
+    name = os.path.basename(path)
+    cur = con.execute("SELECT id FROM files WHERE name=?", (name,)).fetchone()
+    if cur:
+        file_id = cur[0]
+        con.execute("DELETE FROM records WHERE file_id=?", (file_id,))
+        con.execute("UPDATE files SET size=?, mtime_ns=?, row_count=0 WHERE id=?", (fp[0], fp[1], file_id))
+    else:
+        file_id = con.execute("INSERT INTO files(name, size, mtime_ns) VALUES(?,?,?)", (name, fp[0], fp[1])).lastrowid
+    rows = _iter_path(path)
+    if cancel is not None:
+        rows = _watch(rows, cancel)
+    con.executemany("INSERT INTO records VALUES(?,?,?,?,?,?,?,?,?,?,?,?,?)", _row_values(file_id, rows))
+    _index_terms(con, file_id)
+    n = con.execute("SELECT COUNT(*) FROM records WHERE file_id=?", (file_id,)).fetchone()[0]
+    con.execute("UPDATE files SET row_count=? WHERE id=?", (n, file_id))
+    return n
+
+
+def _by_dir(paths: list[str]) -> dict[str, list[str]]:
+    groups: dict[str, list[str]] = {}
+    for p in paths:
+        groups.setdefault(os.path.dirname(os.path.abspath(p)), []).append(p)
+    return groups
+
+
+class _Cancelled(Exception):
+    pass
+
+
+def _watch(rows, cancel):
+    for n, row in enumerate(rows, 1):
+        if n % 4096 == 0 and cancel.is_set():
+            raise _Cancelled
+        yield row
+
+
+def ensure_index(paths: list[str], cancel=None, progress=None) -> list[str]:
+    """
+    Brings the index up to date for the given source files and returns the
+    subset of `paths` that can be answered from it. Only files whose
+    size/mtime changed (or are new) get re-parsed; entries for files that no
+    longer exist are dropped. Setting `cancel` (threading.Event-like) rolls
+    back the file being indexed and returns what is ready so far.
+    progress(path) is called before each file that has to be parsed.
+    """
+    ready = []
+    with _build_lock:
+        for directory, group in _by_dir(paths).items():
+            try:
+                con = _connect(directory)
+            except sqlite3.Error:
+                continue
+            try:
+                known = {name: (fid, size, mtime) for fid, name, size, mtime in con.execute("SELECT id, name, size, mtime_ns FROM files")}
+                stale = False  # records were dropped, so some terms may be orphaned
+                for name, (fid, _s, _m) in known.items():
+                    if not os.path.exists(os.path.join(directory, name)):
+                        con.execute("DELETE FROM records WHERE file_id=?", (fid,))
+                        con.execute("DELETE FROM files WHERE id=?", (fid,))
+                        stale = True
+                con.commit()
+                for path in group:
+                    if cancel is not None and cancel.is_set():
+                        break
+                    fp = _fingerprint(path)
+                    if fp is None:
+                        continue
+                    k = known.get(os.path.basename(path))
+                    if not (k and (k[1], k[2]) == fp):
+                        if progress: progress(path)
+                        try:
+                            _index_file(con, path, fp, cancel)
+                            con.commit()
+                            stale = stale or bool(k)
+                        except _Cancelled:
+                            con.rollback()
+                            break
+                        except Exception:
+                            con.rollback()
+                            continue
+                    ready.append(path)
+                if stale:
+                    _prune_terms(con)
+                    con.commit()
+            finally:
+                con.close()
+    return ready
+
+
+def row_counts(directory: str) -> dict[str, tuple[int, int, int]]:
+    """{name: (size, mtime_ns, rows)} for files indexed in `directory`; {} without an index."""
+    path = index_path(directory)
+    if not os.path.exists(path):
+        return {}
+    con = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=1)
+    try:
+        return {name: (size, mtime, n) for name, size, mtime, n in con.execute("SELECT name, size, mtime_ns, row_count FROM files")}
+    except sqlite3.Error:
+        return {}
+    finally:
+        con.close()
+
+
+def current_paths(paths: list[str]) -> list[str]:
+    """The subset of `paths` the index already answers for (up to date); never builds."""
+    out = []
+    for directory, group in _by_dir(paths).items():
+        known = row_counts(directory)
+        out += [p for p in group if (known.get(os.path.basename(p)) or ())[:2] == _fingerprint(p)]
+    return out
+
+
+def _hit(name: str, r: tuple, kind: str) -> BreachHit:
+    _fid, email, username, domain, password, password_hash, salt, src_label = r
+    if kind in ("email", "local"):
+        username = domain = None
+    elif kind in ("domain", "subdomain"):
+        username = None
+    elif kind != "hash":  # hash matches keep the whole row
+        email = domain = None
+    return BreachHit(name, email, username, domain, password, password_hash, salt, src_label)
+
+
+# Lookups run per file: each query is a list of branches (condition, args)
+# whose rows are united, and _file_sql() pins every branch to one file_id
+# and a rowid floor. The key indexes end in file_id, so an exact key is a
+# single seek whose entries already come in rowid order.
+def _query(t: str, kind: str) -> list[tuple[str, tuple]]:
+    if kind == "email":
+        return [("email_n=?", (t,))]
+    if kind == "domain":
+        r = reverse_domain(t)
+        return [("rdomain_n=?", (r,)), ("redomain_n=?", (r,))]
+    if kind == "subdomain":
+        r = reverse_domain(t)
+        lo, hi = r + ".", r + _LABEL_NEXT
+        return [("(rdomain_n=? OR (rdomain_n>=? AND rdomain_n<?))", (r, lo, hi)),
+                ("(redomain_n=? OR (redomain_n>=? AND redomain_n<?))", (r, lo, hi))]
+    if kind == "local":  # email local part: "t@..." is exactly the range [t@, tA)
+        return [("email_n>=? AND email_n<?", (t + "@", t + "A"))]
+    return [("username_n=?", (t,))]
+
+
+_TOP = "\U0010ffff"  # sorts after any character, closes a prefix range
+
+
+def _pattern_query(p: str) -> tuple[list[tuple[str, tuple]], str]:
+    """(branches, hit kind) for a wildcard pattern; rows still need _pattern_match()."""
+    kind, prefix, exact, suffix = pattern_plan(p)
+    if kind == "email":
+        if prefix:
+            return [("email_n>=? AND email_n<?", (prefix, prefix + _TOP))], kind
+        if exact:
+            return [("redomain_n=?", (reverse_domain(exact),))], kind
+        if suffix:
+            r = reverse_domain(suffix)
+            return [("redomain_n>=? AND redomain_n<?", (r + ".", r + _LABEL_NEXT))], kind
+        return [("email_n IS NOT NULL", ())], kind
+    if kind == "username":
+        if prefix:
+            return [("username_n>=? AND username_n<?", (prefix, prefix + _TOP))], kind
+        return [("username_n IS NOT NULL", ())], kind
+    if suffix:
+        r = reverse_domain(suffix)
+        lo, hi = r + ".", r + _LABEL_NEXT
+        return [("rdomain_n>=? AND rdomain_n<?", (lo, hi)), ("redomain_n>=? AND redomain_n<?", (lo, hi))], kind
+    # Forward prefixes can't use the reversed domain columns.
+    return [("(rdomain_n IS NOT NULL OR redomain_n IS NOT NULL)", ())], kind
+
+
+def _pin(cond: str) -> str:
+    # Key ranges must walk their key index: without statistics the planner
+    # would rather read the whole file through records_file, so "+" keeps
+    # file_id out of its choices there. Whole-column conditions do want that.
+    return "+file_id=? AND rowid>?" if "<" in cond else "file_id=? AND rowid>?"
+
+
+def _file_sql(branches: list[tuple[str, tuple]], file_id: int, after: int, limit: int = -1) -> tuple[str, tuple]:
+    """SELECT rowid + _COLS for one file's rows past rowid `after`, in rowid order (limit -1 = all)."""
+    if len(branches) == 1:
+        cond, args = branches[0]
+        return f"SELECT rowid, {_COLS} FROM records WHERE {_pin(cond)} AND {cond} ORDER BY rowid LIMIT ?", (file_id, after, *args, limit)
+    sub = " UNION ".join(f"SELECT rowid FROM records WHERE {_pin(cond)} AND {cond}" for cond, _a in branches)
+    args = tuple(v for _c, a in branches for v in (file_id, after, *a))
+    return f"SELECT rowid, {_COLS} FROM records WHERE rowid IN ({sub}) ORDER BY rowid LIMIT ?", (*args, limit)
+
+
+def fuzzy_terms(paths: list[str], term: str, max_distance: int) -> dict[str, int]:
+    """
+    {indexed term: edit distance} for usernames/email local parts within
+    `max_distance` of `term`. Only very short terms with a large distance,
+    where trigrams can't prune anything, fall back to every term of a
+    compatible length.
+    """
+    grams = sorted(trigrams(term))
+    probes = 3 * max_distance + 1
+    lo, hi = len(term) - max_distance, len(term) + max_distance
+    out: dict[str, int] = {}
+    for directory in _by_dir(paths):
+        con = _connect(directory)
+        try:
+            if probes <= len(grams):
+                df = dict(con.execute(f"SELECT gram, n FROM gram_df WHERE gram IN ({','.join('?' * len(grams))})", grams))
+                rare = sorted(grams, key=lambda g: df.get(g, 0))[:probes]
+                cur = con.execute(f"SELECT DISTINCT t.term FROM grams g JOIN terms t ON t.id=g.term_id"
+                                  f" WHERE g.gram IN ({','.join('?' * len(rare))}) AND t.len BETWEEN ? AND ?", (*rare, lo, hi))
+            else:
+                cur = con.execute("SELECT term FROM terms WHERE len BETWEEN ? AND ?", (lo, hi))
+            gset, need = set(grams), len(grams) - 3 * max_distance
+            for (cand,) in cur:
+                if need > 0 and len(trigrams(cand) & gset) < need:
+                    continue  # count filter: too few shared trigrams to be within k
+                d = _levenshtein(term, cand, max_distance)
+                if d is not None:
+                    out[cand] = d
+        finally:
+            con.close()
+    return out
+
+
+def iter_lookup(path: str, queries: list[tuple[str, str]], after: tuple[int, int] | None = None, batch: int = -1):
+    """
+    Lazily yields (position, target, hit) for one indexed file, straight from
+    the cursor: queries in order, each one's rows in file order. `kind` is
+    one of "email", "domain", "subdomain" (the domain and everything under
+    it), "local" (email local part), "username" or "pattern" (wildcards, see
+    breach_check.pattern_plan()). position is (query number, rowid); pass a
+    yielded one as `after` to resume right behind it (a keyset cursor, so a
+    later page costs the same as the first). With `batch`, rows are read
+    that many at a time, so a caller that stops early (paging) never has
+    SQLite order more than one batch. Only meaningful for paths returned by
+    ensure_index().
+    """
+    con = _connect(os.path.dirname(os.path.abspath(path)))
+    try:
+        row = con.execute("SELECT id FROM files WHERE name=?", (os.path.basename(path),)).fetchone()
+        if row is None:
+            return
+        name = os.path.basename(path)
+        for qi, (t, kind) in enumerate(queries):
+            if after is not None and qi < after[0]:
+                continue
+            if kind == "pattern":
+                branches, hit_kind = _pattern_query(t)
+            else:
+                branches, hit_kind = _query(t, kind), kind
+            floor = after[1] if after is not None and qi == after[0] else 0
+            while True:
+                n = 0
+                for r in con.execute(*_file_sql(branches, row[0], floor, batch)):
+                    n, floor = n + 1, r[0]
+                    if kind != "pattern" or _pattern_match(t, r[2:]):
+                        yield (qi, r[0]), t, _hit(name, r[1:], hit_kind)
+                if n != batch:
+                    break
+    finally:
+        con.close()
+
+
+def lookup_many(paths: list[str], queries: list[tuple[str, str]]) -> dict[str, dict[str, list[BreachHit]]]:
+    """
+    Answers several (normalized_target, kind) queries (see iter_lookup())
+    and collects the hits: {path: {target: hits}}, each list in file order.
+    For small result sets such as fuzzy candidates; scans iterate instead.
+    """
+    out: dict[str, dict[str, list[BreachHit]]] = {}
+    for p in paths:
+        found = out[p] = {}
+        for _pos, t, hit in iter_lookup(p, queries):
+            found.setdefault(t, []).append(hit)
+    return out
+
+
+def lookup_hashes(paths: list[str], digests: dict[str, str], salted: dict | None = None) -> dict[str, list[tuple[str, BreachHit]]]:
+    """
+    Rows whose password hash matches one of `digests` ({lowercase hex: label},
+    e.g. a password's MD5/NTLM/SHA-1/SHA-256). Unsalted rows are found via
+    hash_n. `salted` maps a path to (label, fn): that file's salted rows are
+    read and matched against fn(salt). Returns {path: [(label, hit)]} for
+    paths with matches. Only meaningful for paths returned by ensure_index().
+    """
+    salted = salted or {}
+    out: dict[str, list[tuple[str, BreachHit]]] = {}
+    for directory, group in _by_dir(paths).items():
+        con = _connect(directory)
+        try:
+            ids = {name: fid for fid, name in con.execute("SELECT id, name FROM files")}
+            wanted = {ids[os.path.basename(p)]: p for p in group if os.path.basename(p) in ids}
+            if digests and wanted:
+                sql = f"SELECT {_COLS}, hash_n FROM records WHERE hash_n IN ({','.join('?' * len(digests))}) ORDER BY rowid"
+                for r in con.execute(sql, list(digests)):
+                    p = wanted.get(r[0])
+                    if p is not None:
+                        out.setdefault(p, []).append((digests[r[-1]], _hit(os.path.basename(p), r[:-1], "hash")))
+            for fid, p in wanted.items():
+                if p not in salted:
+                    continue
+                label, fn = salted[p]
+                sql = f"SELECT {_COLS} FROM records WHERE file_id=? AND salt IS NOT NULL AND salt<>'' AND password_hash IS NOT NULL ORDER BY rowid"
+                for r in con.execute(sql, (fid,)):
+                    if normalize_hash(r[5]) == fn(r[6]):
+                        out.setdefault(p, []).append((label, _hit(os.path.basename(p), r, "hash")))
+        finally:
+            con.close()
+    return out
@@ -0,0 +1,122 @@
+
+import os
+import threading
+
+from . import breach_check
+from .breach_bloom import build as bloom_build, is_current as bloom_current
+from .breach_check import COMPILED_EXT, SOURCE_EXTS, load_sources, scans_active
+from .breach_index import ensure_index
+
+
+class BackgroundIndexer(threading.Thread):
+    """
+    Polls BREACH_DIR and keeps _index.sqlite current for the enabled sources,
+    one changed file at a time, so the first scan after an import doesn't pay
+    the parse. With the index turned off it keeps the Bloom filter sidecars
+    current instead, since scans then stream the files. Backs off whenever a
+    foreground scan is running: the file in progress is rolled back and
+    retried once the scan is over.
+    """
+
+    def __init__(self, on_status=None, enabled=None, interval: float = 5.0, pause: float = 0.5):
+        super().__init__(name="breach-indexer", daemon=True)
+        self.on_status = on_status or (lambda s: None)
+        self.enabled = enabled or (lambda: True)
+        self.interval, self.pause = interval, pause
+        self.status = ""
+        self._stop_event = threading.Event()
+        self._wake = threading.Event()
+        self._seen: dict[str, tuple[int, int]] = {}  # name -> (size, mtime_ns) as last indexed
+        self._filtered: dict[str, tuple[int, int]] = {}  # same, for filters that failed to build
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake.set()
+
+    def poke(self):
+        """Re-check now instead of at the next poll (e.g. right after an import)."""
+        self._wake.set()
+
+    def is_set(self) -> bool:
+        # Cancellation hook handed to ensure_index().
+        return self._stop_event.is_set() or scans_active()
+
+    def _set_status(self, s: str):
+        if s != self.status:
+            self.status = s
+            try:
+                self.on_status(s)
+            except Exception:
+                pass
+
+    def _snapshot(self) -> dict[str, tuple[int, int]]:
+        snap = {}
+        try:
+            with os.scandir(breach_check.BREACH_DIR) as it:
+                for e in it:
+                    if e.name.startswith("_") or not e.name.lower().endswith(SOURCE_EXTS):
+                        continue
+                    try:
+                        st = e.stat()
+                    except OSError:
+                        continue
+                    snap[e.name] = (st.st_size, st.st_mtime_ns)
+        except OSError:
+            pass
+        return snap
+
+    def _pass(self):
+        snap = self._snapshot()
+        paths = [p for p in load_sources() if not p.endswith(COMPILED_EXT)]
+        todo = [p for p in paths if self._seen.get(os.path.basename(p)) != snap.get(os.path.basename(p))]
+        gone = [n for n in self._seen if n not in snap]
+        if gone and paths and not todo:
+            todo = paths[:1]  # any indexed file lets ensure_index() drop the deleted ones
+        for n in gone:
+            del self._seen[n]
+        for i, p in enumerate(todo, 1):
+            name = os.path.basename(p)
+            while scans_active() and not self._stop_event.is_set():
+                self._set_status("Index: paused while scanning")
+                self._stop_event.wait(1.0)
+            if self._stop_event.is_set() or not self.enabled():
+                return
+            self._set_status(f"Index: indexing {name} ({i}/{len(todo)})…")
+            ready = ensure_index([p], cancel=self)
+            if p in ready or not self.is_set():
+                # indexed, or failed for good (unreadable): don't retry until it changes
+                self._seen[name] = snap.get(name)
+            self._stop_event.wait(self.pause)
+        if all(self._seen.get(os.path.basename(p)) == snap.get(os.path.basename(p)) for p in paths):
+            self._set_status(f"Index: up to date ({len(paths)} file(s))")
+        else:
+            self._set_status("Index: waiting to resume")
+
+    def _filter_pass(self):
+        snap = self._snapshot()
+        paths = [p for p in load_sources() if not p.endswith(COMPILED_EXT)]
+        todo = [p for p in paths if not bloom_current(p) and self._filtered.get(os.path.basename(p)) != snap.get(os.path.basename(p))]
+        for i, p in enumerate(todo, 1):
+            name = os.path.basename(p)
+            while scans_active() and not self._stop_event.is_set():
+                self._set_status("Index: off (filters paused while scanning)")
+                self._stop_event.wait(1.0)
+            if self._stop_event.is_set() or self.enabled():
+                return
+            self._set_status(f"Index: off (building filter for {name}, {i}/{len(todo)})…")
+            if not bloom_build(p, cancel=self) and not self.is_set():
+                self._filtered[name] = snap.get(name)  # unreadable: don't retry until it changes
+            self._stop_event.wait(self.pause)
+        self._set_status("Index: off")
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                if self.enabled():
+                    self._pass()
+                else:
+                    self._filter_pass()
+            except Exception as e:
+                self._set_status(f"Index: error ({e})")
+            self._wake.wait(self.interval)
+            self._wake.clear()
@@ -2,45 +2,192 @@
 import hashlib
 import urllib.request
 import urllib.error
+from urllib.parse import urlparse
 import io
 import gzip
 import zipfile
 import os
+import csv
+import http.client
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait as futures_wait
+from typing import Iterable
 
-from .breach_check import BREACH_DIR
+from .breach_check import BREACH_DIR, catalog, get_enabled
+from .breach_index import current_paths, lookup_hashes
+from . import password_index
+from .pwned_cache import RangeCache, parse_range
+from . import pwned_offline
 
 UA = "LookupTool/11 (k-anon)"
 API_BASE = "https://api.pwnedpasswords.com/range/"
 
-def hibp_k_anon(password: str, timeout: float = 8.0) -> tuple[bool, int]:
+_ranges = RangeCache()
+
+def configure_range_cache(ttl_hours: float | None = None, max_mb: float | None = None):
+    """Applies the Settings values to the on-disk range cache."""
+    if ttl_hours is not None:
+        _ranges.ttl = max(0.0, float(ttl_hours)) * 3600
+    if max_mb is not None:
+        _ranges.max_bytes = int(max(1.0, float(max_mb)) * (1 << 20))
+
+def _fetch_range(prefix: str, etag: str | None, last_modified: str | None, timeout: float):
+    headers = {"User-Agent": UA}
+    if etag: headers["If-None-Match"] = etag
+    if last_modified: headers["If-Modified-Since"] = last_modified
+    req = urllib.request.Request(API_BASE + prefix, headers=headers)
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return resp.read().decode("utf-8", "ignore"), resp.headers.get("ETag"), resp.headers.get("Last-Modified")
+    except urllib.error.HTTPError as e:
+        return "not-modified" if e.code == 304 else None
+    except Exception:
+        return None
+
+def hibp_k_anon(password: str, timeout: float = 8.0, use_cache: bool = True, offline: bool = True) -> tuple[bool, int]:
     """
     Uses HaveIBeenPwned PwnedPasswords k-anonymity API.
     Sends only SHA1 prefix (5 chars). Returns (found, count).
+    With offline, a local Pwned Passwords set (see pwned_offline) answers
+    instead and nothing is sent: SHA-1 data when there is any, else NTLM
+    (the same passwords, so either gives the same answer). Range responses are cached on disk (see
+    pwned_cache), so repeat and nearby checks don't go back to the network
+    until the entry expires.
     """
     if not password:
         return False, 0
+    if offline:
+        for kind in ("sha1", "ntlm"):
+            res = pwned_offline.lookup(password, kind)
+            if res is not None:
+                return res
     sha1 = hashlib.sha1(password.encode("utf-8")).hexdigest().upper()
     prefix, suffix = sha1[:5], sha1[5:]
-    url = API_BASE + prefix
-    req = urllib.request.Request(url, headers={"User-Agent": UA})
-    try:
-        with urllib.request.urlopen(req, timeout=timeout) as resp:
-            body = resp.read().decode("utf-8", "ignore")
-    except Exception:
+    fetch = lambda p, etag, lm: _fetch_range(p, etag, lm, timeout)
+    if use_cache:
+        counts = _ranges.get(prefix, fetch)
+    else:
+        res = fetch(prefix, None, None)
+        counts = parse_range(res[0]) if isinstance(res, tuple) else None
+    if not counts or suffix not in counts:
         return False, 0
-    count = 0
-    found = False
-    for line in body.splitlines():
-        if ":" not in line: continue
-        suf, cnt = line.split(":", 1)
-        if suf.strip().upper() == suffix:
-            try:
-                count = int(cnt.strip())
-            except ValueError:
-                count = 0
-            found = True
-            break
-    return found, count
+    return True, counts[suffix]
+
+# Bulk audits reuse one HTTPS connection per worker thread (keep-alive)
+# instead of a fresh urllib connection per range.
+_API = urlparse(API_BASE)
+_conns = threading.local()
+AUDIT_WORKERS = 8
+AUDIT_FIELDS = ("line", "sha1", "found", "count")
+
+def _fetch_range_keepalive(prefix: str, etag: str | None, last_modified: str | None, timeout: float):
+    headers = {"User-Agent": UA}
+    if etag: headers["If-None-Match"] = etag
+    if last_modified: headers["If-Modified-Since"] = last_modified
+    for attempt in range(3):
+        conn = getattr(_conns, "conn", None)
+        try:
+            if conn is None:
+                conn = _conns.conn = http.client.HTTPSConnection(_API.netloc, timeout=timeout)
+            conn.request("GET", _API.path + prefix, headers=headers)
+            resp = conn.getresponse()
+            body = resp.read()
+            if resp.status == 200:
+                return body.decode("utf-8", "ignore"), resp.getheader("ETag"), resp.getheader("Last-Modified")
+            if resp.status == 304:
+                return "not-modified"
+            if resp.status in (429, 503):
+                try:
+                    time.sleep(min(10.0, float(resp.getheader("Retry-After") or 1)))
+                except ValueError:
+                    time.sleep(1.0)
+                continue
+            return None
+        except (OSError, http.client.HTTPException):
+            # dropped keep-alive connection: reconnect and retry
+            if conn is not None: conn.close()
+            _conns.conn = None
+    return None
+
+def audit_passwords(passwords: Iterable[str], out_path: str, workers: int = AUDIT_WORKERS, timeout: float = 8.0,
+                    cancel=None, progress=None, offline: bool = True) -> dict:
+    """
+    Checks many passwords against Pwned Passwords with one range request per
+    distinct SHA-1 prefix. Everything is hashed up front and grouped by
+    prefix; ranges are fetched by a bounded thread pool over keep-alive
+    connections (and the range cache). One CSV row per input password,
+    (line, sha1, found, count), is streamed to `out_path` (.gz to compress) as
+    each range arrives, so rows come in completion order; sort by line for
+    input order. Plaintext passwords are never written. With offline and a
+    local SHA-1 Pwned Passwords set present, ranges come from it instead of
+    the API (results are keyed by SHA-1, so NTLM-only data can't serve them). found is "error" when a range could not be fetched. progress(prefixes_done, prefixes_total) and
+    cancel (threading.Event-like) work as for scans.
+    Returns a summary: passwords, unique, prefixes, found, errors, cancelled.
+    """
+    groups: dict[str, dict[str, list[int]]] = {}  # prefix -> {suffix: [line numbers]}
+    n = 0
+    for n, pwd in enumerate(passwords, 1):
+        if not pwd:
+            continue
+        h = hashlib.sha1(pwd.encode("utf-8")).hexdigest().upper()
+        groups.setdefault(h[:5], {}).setdefault(h[5:], []).append(n)
+    summary = {"passwords": sum(len(v) for g in groups.values() for v in g.values()),
+               "unique": sum(len(g) for g in groups.values()), "prefixes": len(groups),
+               "found": 0, "errors": 0, "cancelled": False}
+    fetch = lambda p, etag, lm: _fetch_range_keepalive(p, etag, lm, timeout)
+    if offline and pwned_offline.available("sha1"):
+        get_range = pwned_offline.range_counts
+    else:
+        get_range = lambda p: _ranges.get(p, fetch)
+    tmp = out_path + ".part"
+    try:
+        with (gzip.open if out_path.lower().endswith(".gz") else open)(tmp, "wt", encoding="utf-8", newline="") as f:
+            w = csv.writer(f)
+            w.writerow(AUDIT_FIELDS)
+            pending = iter(groups)
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+                running: dict = {}
+                done = 0
+                while True:
+                    # Keep a bounded window in flight rather than one future per prefix.
+                    while len(running) < max(1, workers) * 4 and not (cancel is not None and cancel.is_set()):
+                        prefix = next(pending, None)
+                        if prefix is None:
+                            break
+                        running[pool.submit(get_range, prefix)] = prefix
+                    if not running:
+                        break
+                    finished, _ = futures_wait(list(running), timeout=0.2, return_when=FIRST_COMPLETED)
+                    for fut in finished:
+                        prefix = running.pop(fut)
+                        try:
+                            counts = fut.result()
+                        except Exception:
+                            counts = None
+                        for suffix, lines in groups[prefix].items():
+                            sha1 = prefix + suffix
+                            if counts is None:
+                                summary["errors"] += len(lines)
+                                w.writerows((ln, sha1, "error", "") for ln in lines)
+                                continue
+                            c = counts.get(suffix, 0)
+                            if c:
+                                summary["found"] += len(lines)
+                            w.writerows((ln, sha1, "yes" if c else "no", c) for ln in lines)
+                        done += 1
+                        if progress: progress(done, len(groups))
+            summary["cancelled"] = cancel is not None and cancel.is_set()
+        os.replace(tmp, out_path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return summary
+
+def audit_password_file(path: str, out_path: str, **kwargs) -> dict:
+    """audit_passwords() over a text file with one password per line (line endings stripped only)."""
+    with open(path, "r", encoding="utf-8", errors="ignore", newline="") as f:
+        return audit_passwords((line.rstrip("\r\n") for line in f), out_path, **kwargs)
 
 def _iter_lines(path: str):
     lower = path.lower()
@@ -61,11 +208,64 @@ def _iter_lines(path: str):
     except Exception:
         return
 
-def local_password_hit(password: str, limit_files: list[str] | None = None, max_scan_files: int = 50) -> tuple[bool, str]:
+# Salted breach rows can only be matched when the source's scheme is known:
+# Settings "breach_salt_schemes" maps a source file name to one of these.
+_h = lambda alg, s: hashlib.new(alg, s.encode("utf-8")).hexdigest()
+SALT_SCHEMES = {
+    "md5(salt+pass)": lambda pwd, salt: _h("md5", salt + pwd),
+    "md5(pass+salt)": lambda pwd, salt: _h("md5", pwd + salt),
+    "md5(md5(pass)+salt)": lambda pwd, salt: _h("md5", _h("md5", pwd) + salt),
+    "sha1(salt+pass)": lambda pwd, salt: _h("sha1", salt + pwd),
+    "sha1(pass+salt)": lambda pwd, salt: _h("sha1", pwd + salt),
+    "sha256(salt+pass)": lambda pwd, salt: _h("sha256", salt + pwd),
+    "sha256(pass+salt)": lambda pwd, salt: _h("sha256", pwd + salt),
+}
+
+_salt_schemes: dict[str, str] = {}
+
+def configure_salt_schemes(schemes: dict | None):
+    """Applies the Settings mapping {source name: scheme}; unknown schemes are ignored."""
+    _salt_schemes.clear()
+    for name, scheme in (schemes or {}).items():
+        if scheme in SALT_SCHEMES:
+            _salt_schemes[name] = scheme
+
+def password_digests(password: str) -> dict[str, str]:
+    """{lowercase hex: algorithm} for the unsalted hashes breach dumps commonly carry."""
+    return {
+        hashlib.md5(password.encode("utf-8")).hexdigest(): "MD5",
+        pwned_offline.ntlm_hash(password).lower(): "NTLM",
+        hashlib.sha1(password.encode("utf-8")).hexdigest(): "SHA-1",
+        hashlib.sha256(password.encode("utf-8")).hexdigest(): "SHA-256",
+    }
+
+def hash_password_hits(password: str, use_index: bool = True) -> dict[str, list]:
+    """
+    Enabled breach sources whose password_hash column holds this password:
+    {source path: [(algorithm or salt scheme, BreachHit)]}. Answered from the
+    breach index only, for the files it already covers: building it is left
+    to the background indexer, and files it hasn't reached (or use_index
+    False) aren't checked for hashes at all.
+    """
+    if not password or not use_index:
+        return {}
+    paths = current_paths([s.path for s in catalog() if s.enabled and s.format != "compiled"])
+    salted = {}
+    for p in paths:
+        scheme = _salt_schemes.get(os.path.basename(p))
+        if scheme:
+            fn = SALT_SCHEMES[scheme]
+            salted[p] = (scheme, lambda salt, fn=fn: fn(password, salt))
+    return lookup_hashes(paths, password_digests(password), salted)
+
+def local_password_hit(password: str, limit_files: list[str] | None = None, use_index: bool = True) -> tuple[bool, str]:
     """
-    Streams through local lists in BREACH_DIR to see if the exact password appears.
-    Returns (found, source_file) first match only (to limit scanning time).
-    Only checks plaintext .txt (or .txt in .zip/.gz). Keeps privacy local.
+    Checks the enabled plaintext lists in BREACH_DIR for the exact password.
+    Returns (found, source_file), first match only. Each list gets a digest
+    index (password_index) on first use, so every list is checked with a
+    binary search. Only plaintext .txt (or .txt in .zip/.gz); without
+    limit_files, the password_hash columns of already-indexed sources are
+    checked too (see hash_password_hits). Keeps privacy local.
     """
     if not password:
         return False, ""
@@ -73,17 +273,19 @@ def local_password_hit(password: str, limit_files: list[str] | None = None, max_
     base = BREACH_DIR
     if not os.path.isdir(base):
         return False, ""
-    files = limit_files if limit_files else sorted(os.listdir(base))
-    scanned = 0
+    files = limit_files if limit_files else get_enabled()
     for name in files:
-        if scanned >= max_scan_files:
-            break
         if not name.lower().endswith((".txt", ".txt.gz", ".zip")):
             continue
-        scanned += 1
         path = os.path.join(base, name)
-        for line in _iter_lines(path) or []:
-            if line.strip() == pwd:
-                return True, name
+        hit = password_index.contains(path, pwd, _iter_lines)
+        if hit is None:
+            # No usable index (e.g. read-only folder): stream the list instead.
+            hit = any(line.strip() == pwd for line in _iter_lines(path))
+        if hit:
+            return True, name
+    if not limit_files:
+        for path, hits in hash_password_hits(pwd, use_index).items():
+            return True, f"{os.path.basename(path)} ({hits[0][0]} hash)"
     return False, ""
 
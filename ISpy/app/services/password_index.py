@@ -0,0 +1,141 @@
+
+import hashlib
+import heapq
+import mmap
+import os
+import struct
+import tempfile
+from array import array
+
+# Sidecar "<list>.pwidx" for plaintext password lists: every distinct stripped
+# line as an 8-byte truncated blake2b digest, sorted, so a lookup is a binary
+# search over the mmapped file instead of a pass over the list.
+#   magic(8) | source size(Q) | source mtime_ns(q) | count(Q) | digests(<Q * count)
+# Two different passwords share a 64-bit digest with negligible odds (~n/2**64).
+MAGIC = b"ISPYPWX1"
+_HEADER = struct.Struct("<8sQqQ")
+SUFFIX = ".pwidx"
+_RUN = 1 << 20  # digests per sorted run; runs are spilled to temp files and merged
+
+
+def sidecar_path(path: str) -> str:
+    return path + SUFFIX
+
+
+def digest(password: str) -> int:
+    d = hashlib.blake2b(password.encode("utf-8", "ignore"), digest_size=8).digest()
+    return int.from_bytes(d, "little")
+
+
+def _spill(digests: list[int], dirname: str):
+    run = tempfile.TemporaryFile(prefix="_pwidx", dir=dirname)
+    array("Q", sorted(set(digests))).tofile(run)
+    run.seek(0)
+    return run
+
+
+def _read_run(run, chunk: int = 1 << 16):
+    while True:
+        a = array("Q")
+        a.frombytes(run.read(8 * chunk))
+        if not a:
+            return
+        yield from a
+
+
+def _write_sorted(f, runs: list) -> int:
+    """Merges sorted digest iterables into f without duplicates; returns the count written."""
+    out, n, last = array("Q"), 0, None
+    for v in heapq.merge(*runs):
+        if v == last:
+            continue
+        out.append(v)
+        last = v
+        if len(out) >= _RUN:
+            out.tofile(f)
+            n += len(out)
+            out = array("Q")
+    out.tofile(f)
+    return n + len(out)
+
+
+def build(path: str, lines) -> str | None:
+    """
+    Builds (or rebuilds) the sidecar for `path` from its lines (the caller's
+    reader, so archives are handled the same way as for a streamed check).
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    out = sidecar_path(path)
+    tmp = out + ".tmp"
+    runs, cur = [], []
+    try:
+        # Bounded memory, like breach_compile: sorted runs on disk, then a heap merge.
+        for line in lines:
+            cur.append(digest(line.strip()))
+            if len(cur) >= _RUN:
+                runs.append(_spill(cur, os.path.dirname(out)))
+                cur = []
+        if runs:
+            runs.append(_spill(cur, os.path.dirname(out)))
+            merged = [_read_run(r) for r in runs]
+        else:
+            merged = [sorted(set(cur))]  # small list: no temp files
+        cur = []
+        with open(tmp, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, st.st_size, st.st_mtime_ns, 0))
+            n = _write_sorted(f, merged)
+            f.seek(0)
+            f.write(_HEADER.pack(MAGIC, st.st_size, st.st_mtime_ns, n))
+        os.replace(tmp, out)
+    except OSError:
+        return None
+    finally:
+        for r in runs:
+            r.close()
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return out
+
+
+def _is_current(side: str, st: os.stat_result) -> bool:
+    try:
+        with open(side, "rb") as f:
+            magic, size, mtime_ns, _n = _HEADER.unpack(f.read(_HEADER.size))
+    except (OSError, struct.error):
+        return False
+    return magic == MAGIC and size == st.st_size and mtime_ns == st.st_mtime_ns
+
+
+def contains(path: str, password: str, lines=None) -> bool | None:
+    """
+    Whether a stripped line of `path` equals `password`, from its sidecar.
+    A stale or missing sidecar is rebuilt first from lines(path) when given;
+    None means there is no usable index and the caller should stream.
+    """
+    try:
+        st = os.stat(path)
+        side = sidecar_path(path)
+        if not _is_current(side, st):
+            if lines is None or not build(path, lines(path)):
+                return None
+        key = digest(password)
+        with open(side, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            _magic, _size, _mtime, n = _HEADER.unpack_from(mm, 0)
+            if len(mm) < _HEADER.size + 8 * n:
+                return None
+            lo, hi = 0, n
+            while lo < hi:
+                mid = (lo + hi) // 2
+                v = struct.unpack_from("<Q", mm, _HEADER.size + 8 * mid)[0]
+                if v < key:
+                    lo = mid + 1
+                elif v > key:
+                    hi = mid
+                else:
+                    return True
+        return False
+    except (OSError, ValueError, struct.error):
+        return None
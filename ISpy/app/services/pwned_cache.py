@@ -0,0 +1,140 @@
+
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+# Pwned Passwords range responses, cached on disk per 5-char SHA-1 prefix:
+#   ranges(prefix, data, etag, last_modified, fetched, used, size)
+# data is the zlib-compressed "SUFFIX:COUNT" lines; parsed ranges are kept as
+# {suffix: count} dicts in a small in-memory LRU on top. Entries older than
+# the TTL are revalidated with If-None-Match / If-Modified-Since. A stale
+# entry is still served when the API can't be reached.
+CACHE_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "pwned_ranges.sqlite")
+DEFAULT_TTL = 7 * 86400
+DEFAULT_MAX_BYTES = 64 << 20
+MEMORY_RANGES = 512
+
+
+def parse_range(body: str) -> dict[str, int]:
+    """{SUFFIX: count} for a range response body (padding rows with count 0 dropped)."""
+    out = {}
+    for line in body.split("\n"):
+        suf, sep, cnt = line.partition(":")
+        if not sep:
+            continue
+        try:
+            n = int(cnt)
+        except ValueError:
+            continue
+        if n > 0:
+            out[suf.strip().upper()] = n
+    return out
+
+
+def _pack(counts: dict[str, int]) -> bytes:
+    return zlib.compress("\n".join(f"{s}:{n}" for s, n in counts.items()).encode("ascii"), 6)
+
+
+def _unpack(data: bytes) -> dict[str, int]:
+    return parse_range(zlib.decompress(data).decode("ascii", "ignore"))
+
+
+class RangeCache:
+    """
+    Thread-safe prefix -> {suffix: count} cache. get() calls
+    fetch(prefix, etag, last_modified) on a miss or an expired entry; fetch
+    returns (body, etag, last_modified), "not-modified", or None on failure.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, ttl: float = DEFAULT_TTL, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path, self.ttl, self.max_bytes = path, ttl, max_bytes
+        self._lock = threading.Lock()
+        self._mem: OrderedDict[str, tuple[float, dict[str, int]]] = OrderedDict()
+        self._con = None
+
+    def _db(self) -> sqlite3.Connection:
+        if self._con is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            con = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("CREATE TABLE IF NOT EXISTS ranges (prefix TEXT PRIMARY KEY, data BLOB NOT NULL,"
+                        " etag TEXT, last_modified TEXT, fetched REAL NOT NULL, used REAL NOT NULL, size INTEGER NOT NULL)")
+            con.execute("CREATE INDEX IF NOT EXISTS ranges_used ON ranges(used)")
+            self._con = con
+        return self._con
+
+    def _remember(self, prefix: str, fetched: float, counts: dict[str, int]):
+        self._mem[prefix] = (fetched, counts)
+        self._mem.move_to_end(prefix)
+        while len(self._mem) > MEMORY_RANGES:
+            self._mem.popitem(last=False)
+
+    def _evict(self, con: sqlite3.Connection):
+        total = con.execute("SELECT COALESCE(SUM(size), 0) FROM ranges").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for prefix, size in con.execute("SELECT prefix, size FROM ranges ORDER BY used").fetchall():
+            con.execute("DELETE FROM ranges WHERE prefix=?", (prefix,))
+            self._mem.pop(prefix, None)
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def get(self, prefix: str, fetch) -> dict[str, int] | None:
+        prefix = prefix.upper()
+        now = time.time()
+        stale = etag = last_modified = None
+        with self._lock:
+            m = self._mem.get(prefix)
+            if m and now - m[0] < self.ttl:
+                self._mem.move_to_end(prefix)
+                return m[1]
+            try:
+                con = self._db()
+                row = con.execute("SELECT data, etag, last_modified, fetched FROM ranges WHERE prefix=?", (prefix,)).fetchone()
+                if row:
+                    stale, etag, last_modified = _unpack(row[0]), row[1], row[2]
+                    if now - row[3] < self.ttl:
+                        con.execute("UPDATE ranges SET used=? WHERE prefix=?", (now, prefix))
+                        con.commit()
+                        self._remember(prefix, row[3], stale)
+                        return stale
+            except (sqlite3.Error, zlib.error, OSError):
+                stale = None
+        res = fetch(prefix, etag, last_modified)
+        with self._lock:
+            now = time.time()
+            if res is None:
+                return stale
+            if res == "not-modified" and stale is not None:
+                counts = stale
+                sql, args = "UPDATE ranges SET fetched=?, used=? WHERE prefix=?", (now, now, prefix)
+            elif res == "not-modified":
+                return None
+            else:
+                body, etag, last_modified = res
+                counts = parse_range(body)
+                data = _pack(counts)
+                sql = "INSERT OR REPLACE INTO ranges VALUES (?,?,?,?,?,?,?)"
+                args = (prefix, data, etag, last_modified, now, now, len(data))
+            self._remember(prefix, now, counts)
+            try:
+                con = self._db()
+                con.execute(sql, args)
+                self._evict(con)
+                con.commit()
+            except sqlite3.Error:
+                pass
+            return counts
+
+    def clear(self):
+        with self._lock:
+            self._mem.clear()
+            try:
+                self._db().execute("DELETE FROM ranges")
+                self._db().commit()
+            except sqlite3.Error:
+                pass
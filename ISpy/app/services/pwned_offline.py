@@ -0,0 +1,320 @@
+
+import hashlib
+import mmap
+import os
+import struct
+import threading
+
+from . import breach_check
+
+# Offline Pwned Passwords data lives in BREACH_DIR/pwned/ (a subfolder, so the
+# breach scanner never mistakes it for a list):
+#   *.txt           the downloadable "ordered by hash" files, HASH:COUNT per
+#                   line; 40 hex digits for SHA-1, 32 for NTLM
+#   sha1/, ntlm/    sharded copies: <PREFIX>.txt files holding SUFFIX:COUNT
+#                   lines, as the official downloader writes them or
+#                   shard_ordered_file() rebuilds them
+# Big ordered files get a sidecar "<file>.pfx": the byte offset of every
+# 4-hex-digit prefix, so a lookup binary-searches ~1/65536 of the file.
+PWNED_SUBDIR = "pwned"
+HASH_LEN = {"sha1": 40, "ntlm": 32}
+TABLE_HEX = 4
+_TABLE_N = 16 ** TABLE_HEX
+_PFX_MAGIC = b"ISPYPFX1"
+_PFX_HEADER = struct.Struct("<8sQq")
+_LINEAR = 4096  # bytes left when the binary search switches to a line scan
+
+
+def pwned_dir() -> str:
+    return os.path.join(breach_check.BREACH_DIR, PWNED_SUBDIR)
+
+
+def _md4(data: bytes) -> bytes:
+    """RFC 1320 MD4, for NTLM when the OpenSSL build no longer offers it."""
+    mask = 0xFFFFFFFF
+    rol = lambda x, n: ((x << n) | (x >> (32 - n))) & mask
+    msg = data + b"\x80" + b"\0" * ((55 - len(data)) % 64) + struct.pack("<Q", len(data) * 8)
+    h = [0x67452301, 0xEFCDAB89, 0x98BADCFE, 0x10325476]
+    for off in range(0, len(msg), 64):
+        x = struct.unpack("<16I", msg[off:off + 64])
+        a, b, c, d = h
+        for i in (0, 4, 8, 12):
+            for k, s in zip(range(i, i + 4), (3, 7, 11, 19)):
+                a, b, c, d = d, rol((a + ((b & c) | (~b & d)) + x[k]) & mask, s), b, c
+        for i in (0, 1, 2, 3):
+            for k, s in zip((i, i + 4, i + 8, i + 12), (3, 5, 9, 13)):
+                a, b, c, d = d, rol((a + ((b & c) | (b & d) | (c & d)) + x[k] + 0x5A827999) & mask, s), b, c
+        for i in (0, 2, 1, 3):
+            for k, s in zip((i, i + 8, i + 4, i + 12), (3, 9, 11, 15)):
+                a, b, c, d = d, rol((a + (b ^ c ^ d) + x[k] + 0x6ED9EBA1) & mask, s), b, c
+        h = [(v + w) & mask for v, w in zip(h, (a, b, c, d))]
+    return struct.pack("<4I", *h)
+
+
+def ntlm_hash(password: str) -> str:
+    data = password.encode("utf-16-le")
+    try:
+        return hashlib.new("md4", data).hexdigest().upper()
+    except ValueError:
+        return _md4(data).hex().upper()
+
+
+def password_hash(password: str, kind: str = "sha1") -> str:
+    return hashlib.sha1(password.encode("utf-8")).hexdigest().upper() if kind == "sha1" else ntlm_hash(password)
+
+
+class OrderedHashFile:
+    """
+    A mmapped file of sorted "HEX:COUNT" lines. key_len is the hex length
+    of the line keys (a full hash, or a suffix in a shard). Files large
+    enough get a prefix table (see the module comment).
+    """
+
+    def __init__(self, path: str, key_len: int, table: bool = True):
+        self.path, self.key_len = path, key_len
+        with open(path, "rb") as f:
+            st = os.fstat(f.fileno())
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if st.st_size else b""
+        self.size = len(self.mm)
+        self.lower = bytes(self.mm[:key_len]).islower()
+        self.table = self._load_table(st) if table and self.size > 64 * _LINEAR else None
+
+    def close(self):
+        if isinstance(self.mm, mmap.mmap):
+            self.mm.close()
+
+    def _key(self, k: str) -> bytes:
+        return (k.lower() if self.lower else k.upper()).encode("ascii")
+
+    def _search(self, key: bytes, lo: int, hi: int) -> int:
+        """Offset of the first line whose key is >= key, within line-aligned [lo, hi)."""
+        mm, n = self.mm, len(key)
+        while hi - lo > _LINEAR:
+            mid = (lo + hi) // 2
+            s = mm.find(b"\n", mid, hi) + 1
+            if s <= 0 or s >= hi:
+                break
+            if mm[s:s + n] < key:
+                lo = s
+            else:
+                hi = s
+        pos = lo
+        while pos < self.size:
+            if mm[pos:pos + n] >= key:
+                return pos
+            nl = mm.find(b"\n", pos)
+            if nl < 0:
+                return self.size
+            pos = nl + 1
+        return self.size
+
+    def _load_table(self, st) -> list[int]:
+        side = self.path + ".pfx"
+        try:
+            with open(side, "rb") as f:
+                head = f.read(_PFX_HEADER.size)
+                if _PFX_HEADER.unpack(head) == (_PFX_MAGIC, st.st_size, st.st_mtime_ns):
+                    return list(struct.unpack(f"<{_TABLE_N + 1}Q", f.read(8 * (_TABLE_N + 1))))
+        except (OSError, struct.error):
+            pass
+        table, pos = [], 0
+        for i in range(_TABLE_N):
+            pos = self._search(self._key(f"{i:0{TABLE_HEX}X}"), pos, self.size)
+            table.append(pos)
+        table.append(self.size)
+        try:
+            tmp = side + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(_PFX_HEADER.pack(_PFX_MAGIC, st.st_size, st.st_mtime_ns))
+                f.write(struct.pack(f"<{_TABLE_N + 1}Q", *table))
+            os.replace(tmp, side)
+        except OSError:
+            pass  # read-only media: keep the table in memory only
+        return table
+
+    def _bounds(self, k: str) -> tuple[int, int]:
+        if self.table is None or len(k) < TABLE_HEX:
+            return 0, self.size
+        i = int(k[:TABLE_HEX], 16)
+        return self.table[i], self.table[i + 1]
+
+    def count(self, k: str) -> int | None:
+        """Count for key `k` (hex), or None when it isn't listed."""
+        key = self._key(k)
+        lo, hi = self._bounds(k)
+        pos = self._search(key, lo, hi)
+        if self.mm[pos:pos + len(key) + 1] != key + b":":
+            return None
+        end = self.mm.find(b"\n", pos)
+        try:
+            return int(self.mm[pos + len(key) + 1:end if end >= 0 else self.size].strip() or 0)
+        except ValueError:
+            return 0
+
+    def range(self, prefix: str) -> dict[str, int]:
+        """{rest of key: count} for every key starting with `prefix`."""
+        key = self._key(prefix)
+        lo, hi = self._bounds(prefix)
+        pos = self._search(key, lo, hi)
+        out = {}
+        while pos < self.size and self.mm[pos:pos + len(key)] == key:
+            end = self.mm.find(b"\n", pos)
+            end = self.size if end < 0 else end
+            k, _, c = bytes(self.mm[pos:end]).partition(b":")
+            try:
+                out[k[len(key):].decode("ascii").upper()] = int(c.strip() or 0)
+            except ValueError:
+                pass
+            pos = end + 1
+        return out
+
+
+_open: dict[str, OrderedHashFile] = {}
+_open_lock = threading.Lock()
+
+
+def _file(path: str, key_len: int) -> OrderedHashFile | None:
+    with _open_lock:
+        try:
+            st = os.stat(path)
+        except OSError:
+            _open.pop(path, None)
+            return None
+        f = _open.get(path)
+        if f is None or f.stamp != (st.st_size, st.st_mtime_ns):
+            if f is not None:
+                f.close()
+            try:
+                f = OrderedHashFile(path, key_len)
+            except (OSError, ValueError):
+                return None
+            f.stamp = (st.st_size, st.st_mtime_ns)
+            _open[path] = f
+        return f
+
+
+def _hash_len_of(path: str) -> int | None:
+    try:
+        with open(path, "rb") as f:
+            line = f.readline(128)
+    except OSError:
+        return None
+    i = line.find(b":")
+    return i if i in HASH_LEN.values() else None
+
+
+def sources(kind: str = "sha1") -> dict:
+    """What offline data there is for `kind`: {"files": [...], "shards": dir | None}."""
+    base, n = pwned_dir(), HASH_LEN[kind]
+    files = []
+    try:
+        names = sorted(os.listdir(base))
+    except OSError:
+        names = []
+    for name in names:
+        p = os.path.join(base, name)
+        if name.lower().endswith(".txt") and os.path.isfile(p) and _hash_len_of(p) == n:
+            files.append(p)
+    shards = os.path.join(base, kind)
+    return {"files": files, "shards": shards if os.path.isdir(shards) else None}
+
+
+def available(kind: str = "sha1") -> bool:
+    s = sources(kind)
+    return bool(s["files"] or s["shards"])
+
+
+def _shard(shards: str, h: str, n: int) -> tuple[OrderedHashFile, str] | None:
+    # Shard names are the hash prefix; their length is whatever the set uses.
+    for plen in (5, 4, 3, 2, 1):
+        p = os.path.join(shards, h[:plen] + ".txt")
+        if os.path.exists(p):
+            f = _file(p, n - plen)
+            return (f, h[plen:]) if f else None
+    return None
+
+
+def lookup_hash(h: str, kind: str | None = None) -> int | None:
+    """
+    Breach count for a SHA-1 (40 hex) or NTLM (32 hex) hash from the offline
+    data: a count (0 = not listed), or None when there is no data for it.
+    """
+    h = h.strip().upper()
+    kind = kind or ("sha1" if len(h) == 40 else "ntlm" if len(h) == 32 else None)
+    if kind not in HASH_LEN or len(h) != HASH_LEN[kind]:
+        return None
+    src = sources(kind)
+    seen = False
+    for p in src["files"]:
+        f = _file(p, HASH_LEN[kind])
+        if f:
+            seen = True
+            c = f.count(h)
+            if c is not None:
+                return c
+    if src["shards"]:
+        hit = _shard(src["shards"], h, HASH_LEN[kind])
+        if hit:
+            c = hit[0].count(hit[1])
+            return c or 0
+        seen = True  # a complete shard set has no file for an unused prefix
+    return 0 if seen else None
+
+
+def lookup(password: str, kind: str = "sha1") -> tuple[bool, int] | None:
+    """hibp_k_anon()-style (found, count) from offline data, or None without any."""
+    c = lookup_hash(password_hash(password, kind), kind)
+    return None if c is None else (c > 0, c)
+
+
+def range_counts(prefix: str, kind: str = "sha1") -> dict[str, int] | None:
+    """The offline equivalent of one range response: {suffix: count}, or None without data."""
+    prefix = prefix.upper()
+    src = sources(kind)
+    out: dict[str, int] = {}
+    seen = False
+    for p in src["files"]:
+        f = _file(p, HASH_LEN[kind])
+        if f:
+            seen = True
+            out.update(f.range(prefix))
+    if src["shards"] and not out and len(prefix) >= 5:
+        seen = True
+        hit = _shard(src["shards"], prefix, HASH_LEN[kind])
+        if hit:
+            out = hit[0].range(hit[1])
+    return out if seen else None
+
+
+def shard_ordered_file(path: str, out_dir: str | None = None, prefix_len: int = 3) -> int:
+    """
+    Splits an ordered-by-hash file into <PREFIX>.txt shards of SUFFIX:COUNT
+    lines (pwned/sha1 or pwned/ntlm by default), one pass, one shard open at
+    a time since the input is sorted. Returns the number of shards written.
+    """
+    n = _hash_len_of(path)
+    if n is None:
+        raise ValueError("not an ordered Pwned Passwords file: " + path)
+    kind = "sha1" if n == 40 else "ntlm"
+    out_dir = out_dir or os.path.join(pwned_dir(), kind)
+    os.makedirs(out_dir, exist_ok=True)
+    cur, out, shards = None, None, 0
+    try:
+        with open(path, "r", encoding="ascii", errors="ignore") as f:
+            for line in f:
+                line = line.strip()
+                if len(line) <= n or line[n] != ":":
+                    continue
+                p = line[:prefix_len].upper()
+                if p != cur:
+                    if out:
+                        out.close()
+                        os.replace(os.path.join(out_dir, cur + ".txt.tmp"), os.path.join(out_dir, cur + ".txt"))
+                    cur, shards = p, shards + 1
+                    out = open(os.path.join(out_dir, p + ".txt.tmp"), "w", encoding="ascii", newline="\n")
+                out.write(line[prefix_len:].upper() + "\n")
+    finally:
+        if out:
+            out.close()
+            os.replace(os.path.join(out_dir, cur + ".txt.tmp"), os.path.join(out_dir, cur + ".txt"))
+    return shards
@@ -5,7 +5,8 @@ import urllib.error
 from urllib.parse import urlparse
 import time
 
-from .breach_check import BREACH_DIR
+from .breach_check import SOURCE_EXTS
+from .breach_import import import_session, import_stream
 
 # Curated SecLists presets (balanced size; good starters)
 # Users can paste any raw GitHub URLs as well.
@@ -39,7 +40,7 @@ def get_presets():
 
 def _safe_name(url: str) -> str:
     base = os.path.basename(urlparse(url).path) or ("seclist_" + str(int(time.time())) + ".txt")
-    if not any(base.lower().endswith(ext) for ext in (".txt",".csv",".json",".gz",".zip",".lst",".log")):
+    if not base.lower().endswith(SOURCE_EXTS):
         base += ".txt"
     # prefix for clarity
     return "seclists_" + base
@@ -47,28 +48,23 @@ def _safe_name(url: str) -> str:
 def download_files(urls: list[str]) -> list[tuple[str, str]]:
     """
     Downloads each URL into BREACH_DIR. Returns list of (filename, status)
-    where status is 'ok' or an error message.
+    where status is 'ok' (possibly with an overlap note) or why it was
+    skipped / failed. Content identical to a pack already present is dropped.
     """
-    os.makedirs(BREACH_DIR, exist_ok=True)
     results = []
-    for url in urls:
-        url = url.strip()
-        if not url:
-            continue
-        name = _safe_name(url)
-        dest = os.path.join(BREACH_DIR, name)
-        try:
-            req = urllib.request.Request(url, headers={"User-Agent": UA})
-            with urllib.request.urlopen(req, timeout=30) as resp, open(dest, "wb") as f:
-                # stream in chunks
-                while True:
-                    chunk = resp.read(65536)
-                    if not chunk:
-                        break
-                    f.write(chunk)
-            results.append((name, "ok"))
-        except urllib.error.HTTPError as e:
-            results.append((name, f"HTTP {e.code}"))
-        except Exception as e:
-            results.append((name, f"error: {e}"))
+    with import_session() as m:
+        for url in urls:
+            url = url.strip()
+            if not url:
+                continue
+            name = _safe_name(url)
+            try:
+                req = urllib.request.Request(url, headers={"User-Agent": UA})
+                with urllib.request.urlopen(req, timeout=30) as resp:
+                    # streamed and hashed in chunks
+                    results.append((name, import_stream(m, resp, name)))
+            except urllib.error.HTTPError as e:
+                results.append((name, f"HTTP {e.code}"))
+            except Exception as e:
+                results.append((name, f"error: {e}"))
     return results
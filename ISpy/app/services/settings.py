@@ -5,6 +5,11 @@ CONFIG_PATH = r"/mnt/data/ISpy0243/ISpy/app/data/config.json"
 DEFAULTS = {
     "hibp_api_key": "",
     "use_hibp_email_scan": False,
+    "breach_use_index": True,
+    "breach_workers": 1,
+    "hibp_cache_ttl_hours": 168,
+    "hibp_cache_max_mb": 64,
+    "breach_salt_schemes": {},
     "capture_rotate": {"duration_sec": 60, "filesize_mb": 20, "files": 5}
 }
 